@@ -0,0 +1,86 @@
+# annotations.py
+import asyncio
+import random
+import weakref
+
+import httpx
+
+# Responses worth retrying: rate limiting and server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class MetadataManagerClient:
+    """Annotation PUTs to the Metadata Manager over a pooled, keep-alive async HTTP client, with a timeout per request
+    and retries with exponential backoff (and jitter) on connection errors, timeouts, 429 and 5xx responses.
+
+    Annotations are sent in batches of batch_size concurrent requests, sharing at most max_connections connections.
+    An httpx client is bound to the event loop it is used in, so there is one per loop."""
+
+    def __init__(self, endpoint, user, password, max_connections=16, timeout=10.0, retries=3, backoff=0.5,
+                 batch_size=32):
+        self.endpoint = endpoint
+        self.auth = httpx.BasicAuth(user, password)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.clients = weakref.WeakKeyDictionary()
+
+    def client(self):
+        loop = asyncio.get_running_loop()
+        client = self.clients.get(loop)
+        if client is None:
+            client = self.clients[loop] = httpx.AsyncClient(auth=self.auth, limits=self.limits, timeout=self.timeout)
+        return client
+
+    def url(self, dataset_id, annotation_id):
+        return f"http://{self.endpoint}/metadata-manager/annotation-dataset/{dataset_id}/{annotation_id}"
+
+    async def put(self, dataset_id, annotation_id, payload):
+        """PUTs one annotation. Returns its status: the HTTP status and JSON response of the last attempt (or the
+        error that ended it) and the number of attempts."""
+        status = {"attempts": 0}
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * (0.5 + random.random()))
+            status["attempts"] += 1
+            try:
+                response = await self.client().put(self.url(dataset_id, annotation_id), json=payload)
+            except httpx.TransportError as e:
+                status.update(status_code=None, error=f"{type(e).__name__}: {e}")
+                continue
+            status.pop("error", None)
+            status["status_code"] = response.status_code
+            try:
+                status["response"] = response.json()
+            except ValueError:
+                status["response"] = response.text
+            if response.status_code not in RETRY_STATUS:
+                break
+        return status
+
+    async def put_batch(self, annotations):
+        # annotations as (dataset_id, annotation_id, payload), sent concurrently over the pool
+        return await asyncio.gather(*(self.put(*annotation) for annotation in annotations))
+
+    async def drain(self, queue):
+        """Sends the annotations put in an asyncio queue until None is put, in batches of what is waiting (up to
+        batch_size), so that annotations are sent while the next ones are still being produced. Returns the status of
+        every annotation, by annotation id."""
+        statuses, done = {}, False
+        while not done:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            if batch[-1] is None:
+                batch.pop()
+                done = True
+            for annotation, status in zip(batch, await self.put_batch(batch)):
+                statuses[annotation[1]] = status
+        return statuses
+
+    async def aclose(self):
+        client = self.clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
@@ -1,24 +1,37 @@
 # api.py
+import asyncio
+import cProfile
 import traceback
+from functools import partial
+from typing import Dict, List, Optional
 
-from fastapi import FastAPI, File, UploadFile, Body
-from fastapi.responses import JSONResponse
+import json
+
+from fastapi import FastAPI, File, UploadFile, Body, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 
 from core.dc_discovery import discover_dcs
-import shutil
 import os
 import uuid
 import uvicorn
 
-import tempfile
-import boto3
 from botocore.exceptions import BotoCoreError, ClientError
 
 import requests
 from requests.auth import HTTPBasicAuth
 import re
 
-from core.unique_dc_discovery import discover_unique_constraints
+from core.key_discovery import discover_keys
+from core.budget import Budget, MemoryBudgetExceeded
+from core.stats import Stats
+from core.dc_discovery import load_dataset
+from app.annotations import MetadataManagerClient
+from app.cache import DiscoveryCache, copy_and_hash
+from app.jobs import JobQueue, QueueFull
+from app.metrics import Metrics
+from app.storage import list_objects, open_object, s3_client
+from core.validation import check_columns, dc_predicates, load_rows, stream_violations
 
 # Environment variables (set via Docker)
 MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9200")
@@ -31,17 +44,168 @@ METADATA_MANAGER_ENDPOINT = os.getenv("METADATA_MANAGER_ENDPOINT", "metadata-man
 AUTH_USER = os.getenv("METADATA_USER", "test")
 AUTH_PASS = os.getenv("METADATA_PASS", "test")
 
+# Pooled async client of the batch annotation endpoint: connections, timeout (s), retries and requests per batch
+ANNOTATIONS = MetadataManagerClient(METADATA_MANAGER_ENDPOINT, AUTH_USER, AUTH_PASS,
+                                    max_connections=int(os.getenv("METADATA_MAX_CONNECTIONS", 16)),
+                                    timeout=float(os.getenv("METADATA_TIMEOUT", 10)),
+                                    retries=int(os.getenv("METADATA_RETRIES", 3)),
+                                    batch_size=int(os.getenv("METADATA_BATCH_SIZE", 32)))
+# Objects of a batch discovered at a time, whatever the parallelism requested
+BATCH_MAX_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", 8))
+
+# Discovery results and Datasets (with their evidence) of recently seen inputs
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 1 << 30))
+CACHE = DiscoveryCache(CACHE_MAX_BYTES)
+
+# CSV reader: "pandas", or "arrow" for chunked, typed reads of UTF-8 files
+CSV_LOADER = os.getenv("CSV_LOADER", "pandas")
+
+# Discovery jobs: processes running them at a time, and jobs that can wait for one before submissions are rejected. Job
+# processes are forked from a fork server that has this module imported.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", 16))
+JOBS = JobQueue(JOB_WORKERS, JOB_QUEUE_DEPTH, preload=[__name__])
+# Counting processes of one discovery, whatever the workers requested. Each job can start that many, so by default the
+# jobs running at once share the CPUs.
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", max(1, (os.cpu_count() or 1) // JOB_WORKERS)))
+
+# Predicates of the DCs of /discover-all, and columns of the keys of the unique endpoints. Keys are not filtered by
+# significance: every exact minimal key is reported, and on small tables the deeper ones are mostly keys by chance
+# (e.g. 27 keys of up to 3 columns on 300 rows of the benchmark table, 2 of them planted).
+DC_DEPTH = 3
+KEY_DEPTH = 2
+
+# Discovery stats of the requests served, for /metrics, and where the cProfile dumps of profiled requests are written
+METRICS = Metrics()
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/dqrulediscovery-profiles")
+
+# Annotation dataset of the Metadata Manager holding the discovered DCs
+ANNOTATION_DATASET = "dqrulediscovery_annotations"
+
 app = FastAPI()
 
-@app.post("/discover-all")
-async def discover_all(file: UploadFile = File(...)):
+
+def cached_discovery(kind, content_key, fetch, row_count=None, sample_pairs=None, workers=1, epsilon=0.0,
+                     time_limit=None, memory_limit=None, profile=False):
+    # Results and Datasets are keyed by the content of the input and the parameters they depend on. Unique constraints
+    # are keys of up to KEY_DEPTH columns found from the PLIs of all the rows, without evidence.
+    # Discovery stops after time_limit seconds or once the resident memory grew by memory_limit MB, with a partial result
+    # (the DCs found so far), which is not cached. A run whose evidence would not fit in memory_limit is refused with
+    # MemoryBudgetExceeded before it is built.
+    # Returns the result and a report: partial, cache hits, stats of the run and, with profile, the path of its cProfile
+    # dump.
+    evidence = kind == "all"
+    depth = DC_DEPTH if evidence else KEY_DEPTH
+    workers = max(1, min(workers, MAX_WORKERS))
+    budget = None
+    if time_limit is not None or memory_limit is not None:
+        budget = Budget(time_limit, memory_limit and memory_limit * (1 << 20))
+    stats = Stats()
+
+    def load(source):
+        if evidence:
+            return load_dataset(source, row_count, sample_pairs=sample_pairs, loader=CSV_LOADER, stats=stats,
+                                budget=budget)
+        return load_rows(source, CSV_LOADER, row_count, stats)
+
+    def discover(ds):
+        if evidence:
+            return discover_dcs(None, depth=depth, dataset=ds, workers=workers, epsilon=epsilon, ratios=True,
+                                budget=budget, stats=stats)
+        return discover_keys(None, depth=depth, dataset=ds, epsilon=epsilon, ratios=True, budget=budget, stats=stats)
+
+    def complete(result):
+        return budget is None or not budget.exhausted
+
+    def run():
+        return CACHE.discover(content_key, fetch, load, discover,
+                              {"row_count": row_count, "sample_pairs": sample_pairs, "evidence": evidence},
+                              {"kind": kind, "depth": depth, "epsilon": epsilon}, keep=complete)
+
+    report = {}
+    if profile:
+        profiler = cProfile.Profile()
+        result, cache = profiler.runcall(run)
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        report["profile"] = os.path.join(PROFILE_DIR, f"{uuid.uuid4().hex}.prof")
+        profiler.dump_stats(report["profile"])
+    else:
+        result, cache = run()
+    report.update(partial=budget is not None and budget.exhausted, cache=cache, stats=stats.asdict())
+    return result, report
+
+
+def finish(kind, response, stats=False):
+    # Records the stats of a discovery in the metrics, and keeps them in the response only if requested
+    METRICS.observe(kind, response["stats"], response["cache"], response["partial"])
+    if not stats:
+        del response["stats"]
+    return response
+
+
+def minio_client():
+    return s3_client(f"http{'s' if MINIO_SECURE else ''}://{MINIO_ENDPOINT}", MINIO_ACCESS_KEY, MINIO_SECRET_KEY)
+
+
+def minio_object(bucket, object_key):
+    # Cache key from the ETag of the object, and a function opening it for streaming only when needed
+    etag, stream = open_object(minio_client(), bucket, object_key)
+    return f"s3:{bucket}/{object_key}:{etag}", lambda: stream
+
+
+def save_upload(file):
+    # Temporary copy of an uploaded file, and the SHA-256 of its content
     temp_filename = f"/tmp/{uuid.uuid4()}.csv"
     with open(temp_filename, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        digest = copy_and_hash(file.file, buffer)
+    return temp_filename, digest
+
+
+def annotation_name(filename):
+    # Dataset name sanitized from a file name or object key, and a unique annotation id from it
+    name_part = os.path.splitext(os.path.basename(filename))[0]
+    name_clean = re.sub(r"[^a-zA-Z0-9_-]", "", name_part).lower() or "unnamed"
+    return name_clean, f"{name_clean}_{uuid.uuid4().hex[:8]}"
+
+
+def remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def discovery_response(result, report):
+    # DCs, the fraction of the tuple pairs violating each of them (0 for exact DCs), whether a budget stopped the
+    # search before it was complete, and the rest of the report of cached_discovery
+    return {"denial_constraints": list(result), "violation_ratios": result, **report}
+
+
+def memory_limit_response(e):
+    # 413 for a run refused because its evidence would not fit in its memory_limit
+    return JSONResponse(status_code=413, content={"error": f"{str(e)}. Use sample_pairs to bound the tuple pairs"})
+
+
+def discover_file(kind, path, digest, **options):
+    # options are the parameters of cached_discovery
+    return discovery_response(*cached_discovery(kind, f"sha256:{digest}", lambda: path, **options))
+
+
+def discover_object(kind, bucket, object_key, **options):
+    # The object is read in ranges straight into the Dataset, without a temporary copy
+    content_key, fetch = minio_object(bucket, object_key)
+    return discovery_response(*cached_discovery(kind, content_key, fetch, **options))
+
+@app.post("/discover-all")
+def discover_all(file: UploadFile = File(...), sample_pairs: Optional[int] = None, workers: int = 1,
+                 epsilon: float = 0.0, time_limit: Optional[float] = None, memory_limit: Optional[int] = None,
+                 stats: bool = False, profile: bool = False):
+    temp_filename, digest = save_upload(file)
 
     try:
-        result = discover_dcs(temp_filename)
-        return {"denial_constraints": result}
+        return finish("all", discover_file("all", temp_filename, digest, sample_pairs=sample_pairs, workers=workers,
+                                           epsilon=epsilon, time_limit=time_limit, memory_limit=memory_limit,
+                                           profile=profile), stats)
+    except MemoryBudgetExceeded as e:
+        return memory_limit_response(e)
     except Exception as e:
         traceback.print_exc()
         return JSONResponse(
@@ -49,18 +213,16 @@ async def discover_all(file: UploadFile = File(...)):
             content={"error": str(e)}
         )
     finally:
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
+        remove_file(temp_filename)
 
 @app.post("/discover-unique")
-async def discover_unique(file: UploadFile = File(...)):
-    temp_filename = f"/tmp/{uuid.uuid4()}.csv"
-    with open(temp_filename, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+def discover_unique(file: UploadFile = File(...), epsilon: float = 0.0, time_limit: Optional[float] = None,
+                    memory_limit: Optional[int] = None, stats: bool = False, profile: bool = False):
+    temp_filename, digest = save_upload(file)
 
     try:
-        result = discover_unique_constraints(temp_filename)
-        return {"denial_constraints": result}
+        return finish("unique", discover_file("unique", temp_filename, digest, epsilon=epsilon, time_limit=time_limit,
+                                              memory_limit=memory_limit, profile=profile), stats)
     except Exception as e:
         traceback.print_exc()
         return JSONResponse(
@@ -68,59 +230,48 @@ async def discover_unique(file: UploadFile = File(...)):
             content={"error": str(e)}
         )
     finally:
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
+        remove_file(temp_filename)
 
 
 
 @app.post("/discover-all-from-minio")
-async def discover_all_from_minio(
+def discover_all_from_minio(
     bucket: str = Body(...),
-    object_key: str = Body(...)
+    object_key: str = Body(...),
+    sample_pairs: Optional[int] = Body(None),
+    workers: int = Body(1),
+    epsilon: float = Body(0.0),
+    time_limit: Optional[float] = Body(None),
+    memory_limit: Optional[int] = Body(None),
+    stats: bool = Body(False),
+    profile: bool = Body(False)
 ):
     try:
-        s3 = boto3.client(
-            "s3",
-            endpoint_url=f"http{'s' if MINIO_SECURE else ''}://{MINIO_ENDPOINT}",
-            aws_access_key_id=MINIO_ACCESS_KEY,
-            aws_secret_access_key=MINIO_SECRET_KEY,
-        )
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp_file:
-            s3.download_fileobj(bucket, object_key, tmp_file)
-            tmp_file_path = tmp_file.name
-
-        result = discover_dcs(tmp_file_path)
-        return {"denial_constraints": result}
+        return finish("all", discover_object("all", bucket, object_key, sample_pairs=sample_pairs, workers=workers,
+                                             epsilon=epsilon, time_limit=time_limit, memory_limit=memory_limit,
+                                             profile=profile), stats)
+    except MemoryBudgetExceeded as e:
+        return memory_limit_response(e)
     except (BotoCoreError, ClientError) as e:
         traceback.print_exc()
         return JSONResponse(status_code=500, content={"error": f"MinIO error: {str(e)}"})
     except Exception as e:
         traceback.print_exc()
         return JSONResponse(status_code=500, content={"error": str(e)})
-    finally:
-        if 'tmp_file_path' in locals() and os.path.exists(tmp_file_path):
-            os.remove(tmp_file_path)
 
 @app.post("/discover-unique-from-minio")
-async def discover_unique_from_minio(
+def discover_unique_from_minio(
     bucket: str = Body(...),
-    object_key: str = Body(...)
+    object_key: str = Body(...),
+    epsilon: float = Body(0.0),
+    time_limit: Optional[float] = Body(None),
+    memory_limit: Optional[int] = Body(None),
+    stats: bool = Body(False),
+    profile: bool = Body(False)
 ):
     try:
-        file_ext = os.path.splitext(object_key)[-1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as tmp_file:
-            s3 = boto3.client(
-                "s3",
-                endpoint_url=f"http{'s' if MINIO_SECURE else ''}://{MINIO_ENDPOINT}",
-                aws_access_key_id=MINIO_ACCESS_KEY,
-                aws_secret_access_key=MINIO_SECRET_KEY,
-            )
-            s3.download_fileobj(bucket, object_key, tmp_file)
-            tmp_file_path = tmp_file.name
-
-        result = discover_unique_constraints(tmp_file_path)
-        return {"denial_constraints": result}
+        return finish("unique", discover_object("unique", bucket, object_key, epsilon=epsilon, time_limit=time_limit,
+                                                memory_limit=memory_limit, profile=profile), stats)
 
     except (BotoCoreError, ClientError) as e:
         traceback.print_exc()
@@ -128,49 +279,229 @@ async def discover_unique_from_minio(
     except Exception as e:
         traceback.print_exc()
         return JSONResponse(status_code=500, content={"error": str(e)})
-    finally:
-        if 'tmp_file_path' in locals() and os.path.exists(tmp_file_path):
-            os.remove(tmp_file_path)
 
 @app.post("/discover-all-and-annotate")
-async def discover_all_and_annotate(file: UploadFile = File(...)):
-    dataset_id = "dqrulediscovery_annotations"
+def discover_all_and_annotate(file: UploadFile = File(...), workers: int = 1, epsilon: float = 0.0,
+                              time_limit: Optional[float] = None, memory_limit: Optional[int] = None,
+                              stats: bool = False, profile: bool = False):
+    dataset_id = ANNOTATION_DATASET
 
     # Create annotation_id based on sanitized input filename
-    base_name = os.path.basename(file.filename)
-    name_part = os.path.splitext(base_name)[0]
-    name_clean = re.sub(r"[^a-zA-Z0-9_-]", "", name_part).lower() or "unnamed"
-    annotation_id = f"{name_clean}_{uuid.uuid4().hex[:8]}"
+    name_clean, annotation_id = annotation_name(file.filename)
 
     temp_filename = f"/tmp/{annotation_id}.csv"
 
     try:
         with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+            digest = copy_and_hash(file.file, buffer)
 
-        dc_result = discover_dcs(temp_filename)
+        dc_result, report = cached_discovery("all", f"sha256:{digest}", lambda: temp_filename, workers=workers,
+                                             epsilon=epsilon, time_limit=time_limit, memory_limit=memory_limit,
+                                             profile=profile)
 
         payload = {
             "regularDatasetId": name_clean,
-            "denialConstraints": dc_result
+            "denialConstraints": list(dc_result)
         }
 
         url = f"http://{METADATA_MANAGER_ENDPOINT}/metadata-manager/annotation-dataset/{dataset_id}/{annotation_id}"
         response = requests.put(url, json=payload, auth=HTTPBasicAuth(AUTH_USER, AUTH_PASS))
 
-        return {
+        return finish("all", {
             "dataset_id": dataset_id,
             "annotation_id": annotation_id,
             "metadata_manager_status": response.status_code,
-            "metadata_manager_response": response.json()
-        }
+            "metadata_manager_response": response.json(),
+            **report
+        }, stats)
 
+    except MemoryBudgetExceeded as e:
+        return memory_limit_response(e)
     except Exception as e:
         traceback.print_exc()
         return JSONResponse(status_code=500, content={"error": str(e)})
     finally:
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
+        remove_file(temp_filename)
+
+
+@app.post("/discover-all-and-annotate/batch")
+async def discover_all_and_annotate_batch(
+    objects: Optional[List[Dict[str, str]]] = Body(None),
+    bucket: Optional[str] = Body(None),
+    prefix: str = Body(""),
+    parallelism: int = Body(4),
+    sample_pairs: Optional[int] = Body(None),
+    epsilon: float = Body(0.0),
+    time_limit: Optional[float] = Body(None),
+    memory_limit: Optional[int] = Body(None),
+    stats: bool = Body(False)
+):
+    # DCs of many MinIO objects, given as [{"bucket", "object_key"}] or as a bucket and a prefix, discovered at most
+    # parallelism at a time (time_limit and memory_limit apply to each). The DCs of each object are annotated in the
+    # Metadata Manager as soon as they are found, through the pooled client. Returns the status of every object:
+    # "annotated", "discovery_failed" or "annotation_failed".
+    try:
+        if objects is None:
+            if bucket is None:
+                return JSONResponse(status_code=400, content={"error": "Either objects or bucket is required"})
+            keys = await run_in_threadpool(list_objects, minio_client(), bucket, prefix)
+            objects = [{"bucket": bucket, "object_key": key} for key in keys]
+        targets = [(obj["bucket"], obj["object_key"]) for obj in objects]
+    except KeyError as e:
+        return JSONResponse(status_code=400, content={"error": f"Object without {str(e)}"})
+    except (BotoCoreError, ClientError) as e:
+        traceback.print_exc()
+        return JSONResponse(status_code=500, content={"error": f"MinIO error: {str(e)}"})
+
+    limit = asyncio.Semaphore(max(1, min(parallelism, BATCH_MAX_PARALLELISM)))
+    queue = asyncio.Queue()
+    sender = asyncio.create_task(ANNOTATIONS.drain(queue))
+
+    async def process(bucket, object_key):
+        status = {"bucket": bucket, "object_key": object_key}
+        async with limit:
+            try:
+                response = await run_in_threadpool(discover_object, "all", bucket, object_key,
+                                                   sample_pairs=sample_pairs, epsilon=epsilon, time_limit=time_limit,
+                                                   memory_limit=memory_limit)
+            except Exception as e:
+                traceback.print_exc()
+                return {**status, "status": "discovery_failed", "error": str(e)}
+        response = finish("all", response, stats)
+        name_clean, annotation_id = annotation_name(object_key)
+        dcs = response["denial_constraints"]
+        await queue.put((ANNOTATION_DATASET, annotation_id, {"regularDatasetId": name_clean, "denialConstraints": dcs}))
+        return {**status, "annotation_id": annotation_id, "denial_constraints": len(dcs),
+                **{field: response[field] for field in ("partial", "cache", "stats") if field in response}}
+
+    try:
+        results = await asyncio.gather(*(process(*target) for target in targets))
+    finally:
+        await queue.put(None)
+        annotations = await sender
+
+    summary = {"annotated": 0, "discovery_failed": 0, "annotation_failed": 0}
+    for result in results:
+        if "annotation_id" in result:
+            annotation = annotations[result["annotation_id"]]
+            code = annotation.get("status_code")
+            result["status"] = "annotated" if code is not None and code < 300 else "annotation_failed"
+            result["metadata_manager"] = annotation
+        summary[result["status"]] += 1
+    return {"dataset_id": ANNOTATION_DATASET, "objects": len(results), **summary, "results": results}
+
+
+@app.post("/validate")
+def validate(file: UploadFile = File(...), dcs: str = Form(...), limit: Optional[int] = None):
+    # DCs one per line, as returned by the discovery endpoints. Streams one JSON record per line: the violating row
+    # pairs {"dc", "t0", "t1"} of each DC (at most limit of them, 0 to only count them), then {"dc", "violations"}.
+    temp_filename, _ = save_upload(file)
+    try:
+        ds = load_rows(temp_filename, CSV_LOADER)
+        lines = [line for line in dcs.splitlines() if line.strip()]
+        for preds in dc_predicates(lines, ds.opmap):
+            check_columns(ds, preds)
+    except (ValueError, KeyError) as e:
+        traceback.print_exc()
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        traceback.print_exc()
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    finally:
+        remove_file(temp_filename)
+
+    records = (json.dumps(record, ensure_ascii=False) + "\n" for record in stream_violations(ds, lines, limit))
+    return StreamingResponse(records, media_type="application/x-ndjson")
+
+def submit_job(kind, fn, *args, cleanup=None, stats=False, **options):
+    # 202 with the id of the job, or 429 if too many jobs are already waiting. The stats of the job are recorded in the
+    # metrics of this process once it is done.
+    try:
+        job = JOBS.submit(partial(fn, kind, *args, **options), cleanup=cleanup,
+                          done=lambda result: finish(kind, result, stats))
+    except QueueFull as e:
+        if cleanup is not None:
+            cleanup()
+        return JSONResponse(status_code=429, content={"error": f"Job queue full: {str(e)}"})
+    return JSONResponse(status_code=202, content={"job_id": job.id, "status": job.status})
+
+@app.post("/jobs/discover-all")
+def submit_discover_all(file: UploadFile = File(...), sample_pairs: Optional[int] = None, workers: int = 1,
+                        epsilon: float = 0.0, time_limit: Optional[float] = None, memory_limit: Optional[int] = None,
+                        stats: bool = False, profile: bool = False):
+    temp_filename, digest = save_upload(file)
+    return submit_job("all", discover_file, temp_filename, digest, cleanup=lambda: remove_file(temp_filename),
+                      stats=stats, sample_pairs=sample_pairs, workers=workers, epsilon=epsilon, time_limit=time_limit,
+                      memory_limit=memory_limit, profile=profile)
+
+@app.post("/jobs/discover-unique")
+def submit_discover_unique(file: UploadFile = File(...), epsilon: float = 0.0, time_limit: Optional[float] = None,
+                           memory_limit: Optional[int] = None, stats: bool = False, profile: bool = False):
+    temp_filename, digest = save_upload(file)
+    return submit_job("unique", discover_file, temp_filename, digest, cleanup=lambda: remove_file(temp_filename),
+                      stats=stats, epsilon=epsilon, time_limit=time_limit, memory_limit=memory_limit, profile=profile)
+
+@app.post("/jobs/discover-all-from-minio")
+def submit_discover_all_from_minio(
+    bucket: str = Body(...),
+    object_key: str = Body(...),
+    sample_pairs: Optional[int] = Body(None),
+    workers: int = Body(1),
+    epsilon: float = Body(0.0),
+    time_limit: Optional[float] = Body(None),
+    memory_limit: Optional[int] = Body(None),
+    stats: bool = Body(False),
+    profile: bool = Body(False)
+):
+    return submit_job("all", discover_object, bucket, object_key, stats=stats, sample_pairs=sample_pairs,
+                      workers=workers, epsilon=epsilon, time_limit=time_limit, memory_limit=memory_limit,
+                      profile=profile)
+
+@app.post("/jobs/discover-unique-from-minio")
+def submit_discover_unique_from_minio(
+    bucket: str = Body(...),
+    object_key: str = Body(...),
+    epsilon: float = Body(0.0),
+    time_limit: Optional[float] = Body(None),
+    memory_limit: Optional[int] = Body(None),
+    stats: bool = Body(False),
+    profile: bool = Body(False)
+):
+    return submit_job("unique", discover_object, bucket, object_key, stats=stats, epsilon=epsilon,
+                      time_limit=time_limit, memory_limit=memory_limit, profile=profile)
+
+@app.get("/jobs")
+def job_queue_stats():
+    return JOBS.stats()
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job: {job_id}"})
+    return job.info()
+
+@app.get("/metrics")
+def metrics():
+    # Prometheus text format
+    gauges = {"cache_result_bytes": CACHE.results.size, "cache_dataset_bytes": CACHE.datasets.size}
+    gauges.update({f"jobs_{name}": value for name, value in JOBS.stats().items()})
+    return PlainTextResponse(METRICS.render(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get("/profiles/{name}")
+def download_profile(name: str):
+    # cProfile dumps of the requests made with profile=true, for pstats or snakeviz
+    path = os.path.join(PROFILE_DIR, os.path.basename(name))
+    if not os.path.isfile(path):
+        return JSONResponse(status_code=404, content={"error": f"Unknown profile: {name}"})
+    return FileResponse(path, media_type="application/octet-stream", filename=os.path.basename(name))
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job = JOBS.cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Unknown job: {job_id}"})
+    return job.info()
 
 
 if __name__ == "__main__":
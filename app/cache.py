@@ -0,0 +1,95 @@
+# cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 1 << 20
+
+
+class SizedLRUCache:
+    """LRU cache bounded by the total (estimated) size in bytes of its values."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def put(self, key, value, nbytes):
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return
+            self.entries[key] = (value, nbytes)
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted
+
+
+def copy_and_hash(src, dst):
+    """Copy a file object into another one, returning the SHA-256 of the content."""
+    h = hashlib.sha256()
+    while chunk := src.read(CHUNK_SIZE):
+        h.update(chunk)
+        dst.write(chunk)
+    return h.hexdigest()
+
+
+def dataset_bytes(ds):
+    # Evidence (if built) plus the encoded columns (about 64 bytes per distinct string), and the table if not dropped
+    size = sum(bits.nbytes for bits in getattr(ds, "evi", None) or [])
+    for col in ds.columns:
+        vals = ds.vals[col]
+        size += ds.codes[col].nbytes + ds.PLILen[col].nbytes + (64 * len(vals) if vals.dtype == object else vals.nbytes)
+    if ds.df is not None:
+        size += int(ds.df.memory_usage(deep=True).sum())
+    return size
+
+
+def result_bytes(result):
+    return sum(len(dc.encode()) for dc in result) + 64
+
+
+class DiscoveryCache:
+    """Discovery results and the Datasets (PLIs, predicates and evidence) they were computed from, keyed by a content
+    hash of the input. Datasets do not depend on the depth or the tolerance of discovery, so calls that only change
+    them reuse the PLIs and evidence built by an earlier call on the same file."""
+
+    def __init__(self, max_bytes):
+        self.results = SizedLRUCache(max_bytes // 8)
+        self.datasets = SizedLRUCache(max_bytes - max_bytes // 8)
+
+    def discover(self, content_key, fetch, load, discover, dataset_params, result_params, keep=None):
+        """Result of discover(dataset) on the content identified by content_key, and a report of the cache hits.
+
+        fetch() returns the path (or a file object) of the content and is only called when the Dataset has to be built
+        by load(source). The result is cached unless keep(result) is false (for partial results)."""
+        result_key = (content_key, tuple(sorted(dataset_params.items())), tuple(sorted(result_params.items())))
+        result = self.results.get(result_key)
+        if result is not None:
+            return result, {"result": "hit", "dataset": "skipped"}
+
+        dataset_key = (content_key, tuple(sorted(dataset_params.items())))
+        ds = self.datasets.get(dataset_key)
+        status = "hit" if ds is not None else "miss"
+        if ds is None:
+            ds = load(fetch())
+            self.datasets.put(dataset_key, ds, dataset_bytes(ds))
+
+        result = discover(ds)
+        if keep is None or keep(result):
+            self.results.put(result_key, result, result_bytes(result))
+        return result, {"result": "miss", "dataset": status}
@@ -0,0 +1,206 @@
+# jobs.py
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+
+
+class QueueFull(Exception):
+    pass
+
+
+def timed_call(fn, args):
+    # Runs in the job process, so the start time is when it actually started
+    started = time.time()
+    result = fn(*args)
+    return started, time.time(), result
+
+
+def run_job(conn, fn, args):
+    # Body of a job process. It leads its own process group, with the counting workers it starts, so that a cancel
+    # terminates them all, and exits through SystemExit on SIGTERM, so its shared memory is released. Sends back
+    # (True, (started, finished, result)) or (False, error).
+    os.setpgrp()
+    job = os.getpid()
+
+    def stop(signum, frame):
+        # The processes the job forks inherit this handler: they exit at once, as e.g. pool workers catch SystemExit
+        if os.getpid() != job:
+            os._exit(1)
+        sys.exit(1)
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        conn.send((True, timed_call(fn, args)))
+    except Exception as e:
+        conn.send((False, "".join(traceback.format_exception_only(e)).strip()))
+    finally:
+        conn.close()
+
+
+def terminate(process):
+    # The job process and its process group, or only the process if it has not started its group yet
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        process.terminate()
+
+
+class Job:
+
+    def __init__(self, fn, args, cleanup=None, done=None):
+        self.id = uuid.uuid4().hex
+        self.fn = fn
+        self.args = args
+        self.cleanup = cleanup
+        self.done = done
+        self.status = "queued"
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.process = None
+
+    def info(self):
+        # Times in seconds, up to now for the jobs still waiting or running
+        now = time.time()
+        info = {
+            "job_id": self.id,
+            "status": self.status,
+            "queue_wait": (self.started or now) - self.submitted,
+            "run_time": (self.finished or now) - self.started if self.started else None,
+        }
+        if self.status == "done":
+            info["result"] = self.result
+        if self.error is not None:
+            info["error"] = self.error
+        return info
+
+
+class JobQueue:
+    """Jobs run in a process of their own, at most workers at a time. The others wait in a FIFO queue of at most
+    max_queued jobs. A cancelled job never runs if it is queued, and its process is terminated if it is running, which
+    frees its slot. Finished jobs are kept for polling, up to history of them.
+
+    Job processes are forked from a single-threaded fork server, not from the calling process, whose other threads may
+    hold locks (e.g. of a cache) that a forked child would never see released. Only fn and its arguments are handed
+    over, pickled; the modules in preload are imported once in the fork server instead of in every job."""
+
+    def __init__(self, workers, max_queued, history=1000, preload=()):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.history = history
+        self.context = multiprocessing.get_context("forkserver")
+        self.context.set_forkserver_preload(list(preload))
+        self.jobs = OrderedDict()
+        self.queued = deque()
+        self.running = 0
+        self.lock = threading.RLock()
+
+    def submit(self, fn, *args, cleanup=None, done=None):
+        # fn(*args) must be picklable. cleanup() is called once the job is over, whatever its outcome. done(result) is
+        # called in this process with the result of a successful job, and returns the result kept for polling.
+        job = Job(fn, args, cleanup, done)
+        with self.lock:
+            if len(self.queued) >= self.max_queued:
+                raise QueueFull(f"{len(self.queued)} jobs already queued")
+            self.jobs[job.id] = job
+            self.queued.append(job)
+            self._dispatch()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancels a job. A queued job never runs; a running one is terminated, and its slot goes to the next job once
+        its process has exited. Returns the job, or None if it does not exist."""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return job
+            if job.status == "queued":
+                self.queued.remove(job)
+                job.started = job.finished = time.time()
+                self._finish(job)
+            else:
+                terminate(job.process)
+            job.status = "cancelled"
+            return job
+
+    def stats(self):
+        with self.lock:
+            return {"workers": self.workers, "running": self.running, "queued": len(self.queued),
+                    "max_queued": self.max_queued}
+
+    def shutdown(self):
+        with self.lock:
+            self.queued.clear()
+            for job in self.jobs.values():
+                if job.status == "running":
+                    terminate(job.process)
+
+    def _dispatch(self):
+        # Called with the lock held. A thread per running job waits for its outcome.
+        while self.queued and self.running < self.workers:
+            job = self.queued.popleft()
+            job.status = "running"
+            job.started = time.time()  # Replaced by the time measured in the job process once it is done
+            self.running += 1
+            receiver, sender = self.context.Pipe(duplex=False)
+            job.process = self.context.Process(target=run_job, args=(sender, job.fn, job.args))
+            job.process.start()
+            sender.close()
+            threading.Thread(target=self._wait, args=(job, receiver), daemon=True).start()
+
+    def _wait(self, job, receiver):
+        try:
+            outcome = receiver.recv()
+        except EOFError:
+            outcome = None
+        finally:
+            receiver.close()
+        job.process.join()
+        if outcome is None:
+            # The process died without an outcome: cancelled, or killed (e.g. out of memory)
+            outcome = (False, f"Job process exited with code {job.process.exitcode}")
+        self._done(job, outcome)
+
+    def _done(self, job, outcome):
+        with self.lock:
+            self.running -= 1
+            ok, value = outcome
+            job.finished = time.time()
+            if ok:
+                job.started, job.finished, result = value
+            if job.status == "running":
+                try:
+                    if ok:
+                        job.result = result if job.done is None else job.done(result)
+                        job.status = "done"
+                    else:
+                        job.error = value
+                        job.status = "failed"
+                except Exception as e:
+                    job.error = "".join(traceback.format_exception_only(e)).strip()
+                    job.status = "failed"
+            self._finish(job)
+            self._dispatch()
+
+    def _finish(self, job):
+        # Called with the lock held
+        if job.cleanup is not None:
+            job.cleanup()
+        finished = len(self.jobs) - len(self.queued) - self.running
+        for job_id in list(self.jobs):
+            if finished <= self.history:
+                break
+            if self.jobs[job_id].status not in ("queued", "running"):
+                del self.jobs[job_id]
+                finished -= 1
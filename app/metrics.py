@@ -0,0 +1,56 @@
+# metrics.py
+import threading
+
+from core.budget import resident_bytes
+
+PREFIX = "dqrulediscovery"
+
+
+def labels(**values):
+    return "{" + ",".join(f'{name}="{value}"' for name, value in values.items()) + "}"
+
+
+class Metrics:
+    """Discovery stats of the requests served, aggregated in Prometheus text format: per-phase wall time (as a sum and
+    a count, per kind of discovery), request counts by cache outcome, and totals of the counters of the runs."""
+
+    def __init__(self):
+        self.requests = {}
+        self.phases = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def observe(self, kind, stats, cache, partial):
+        with self.lock:
+            key = (kind, cache.get("result"), cache.get("dataset"), partial)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for name, entry in stats.get("phases", {}).items():
+                total = self.phases.setdefault((kind, name), [0.0, 0])
+                total[0] += entry["seconds"]
+                total[1] += 1
+            for name, value in stats.items():
+                if name not in ("phases", "peak_rss_growth_bytes", "process_peak_rss_bytes"):
+                    self.counters[(kind, name)] = self.counters.get((kind, name), 0) + value
+
+    def render(self, gauges=None):
+        """Text exposition of the metrics, with the current resident memory and the extra gauges given as
+        {name: value}."""
+        lines = [f"# TYPE {PREFIX}_requests_total counter"]
+        with self.lock:
+            for (kind, result, dataset, partial), count in sorted(self.requests.items(), key=str):
+                lines.append(f"{PREFIX}_requests_total"
+                             f"{labels(kind=kind, result=result, dataset=dataset, partial=str(partial).lower())} {count}")
+            lines.append(f"# TYPE {PREFIX}_phase_seconds summary")
+            for (kind, name), (seconds, count) in sorted(self.phases.items()):
+                lines.append(f"{PREFIX}_phase_seconds_sum{labels(kind=kind, phase=name)} {seconds}")
+                lines.append(f"{PREFIX}_phase_seconds_count{labels(kind=kind, phase=name)} {count}")
+            for name in sorted({name for _, name in self.counters}):
+                lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+                for (kind, counter), value in sorted(self.counters.items()):
+                    if counter == name:
+                        lines.append(f"{PREFIX}_{name}_total{labels(kind=kind)} {value}")
+        gauges = dict(gauges or {}, resident_memory_bytes=resident_bytes())
+        for name, value in gauges.items():
+            lines.append(f"# TYPE {PREFIX}_{name} gauge")
+            lines.append(f"{PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,93 @@
+# storage.py
+import io
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+
+BLOCK_SIZE = 1 << 20
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def s3_client(endpoint_url, access_key, secret_key, max_connections=32):
+    # One client, and so one connection pool, per process. Clients are thread safe but must not cross a fork.
+    key = (os.getpid(), endpoint_url, access_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = boto3.client(
+                "s3",
+                endpoint_url=endpoint_url,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                config=Config(max_pool_connections=max_connections),
+            )
+    return client
+
+
+class S3RangeReader(io.RawIOBase):
+    """Seekable, read-only file over an S3 object. Every read is a ranged GET of the requested bytes, so readers that
+    stop early (CSV with nrows) or seek (the Parquet footer and column chunks) only transfer what they use."""
+
+    def __init__(self, client, bucket, key, size):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.name = key
+        self.size = size
+        self.pos = 0
+        self.bytesRead = 0
+        self.requests = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self.pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Unsupported whence: {whence}")
+        self.pos = max(pos, 0)
+        return self.pos
+
+    def readinto(self, b):
+        if self.pos >= self.size or not len(b):
+            return 0
+        end = min(self.pos + len(b), self.size) - 1
+        body = self.client.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={self.pos}-{end}")["Body"]
+        data = body.read()
+        n = len(data)
+        memoryview(b).cast("B")[:n] = data
+        self.pos += n
+        self.bytesRead += n
+        self.requests += 1
+        return n
+
+
+def open_object(client, bucket, key, block_size=BLOCK_SIZE):
+    """ETag of an object and a buffered file reading it in ranges of at least block_size bytes. Nothing but the
+    object metadata is fetched until the file is read."""
+    head = client.head_object(Bucket=bucket, Key=key)
+    raw = S3RangeReader(client, bucket, key, head["ContentLength"])
+    return head["ETag"].strip('"'), io.BufferedReader(raw, buffer_size=block_size)
+
+
+def list_objects(client, bucket, prefix=""):
+    """Keys of the objects of a bucket under a prefix, all pages of the listing. Folder markers are skipped."""
+    keys = []
+    for page in client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        keys += [obj["Key"] for obj in page.get("Contents", []) if not obj["Key"].endswith("/")]
+    return keys
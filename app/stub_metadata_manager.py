@@ -0,0 +1,62 @@
+# stub_metadata_manager.py
+# Local stand-in for the Metadata Manager annotation API, to run the annotation endpoints offline:
+#
+#   python -m app.stub_metadata_manager --port 8080 --fail-rate 0.2
+#   METADATA_MANAGER_ENDPOINT=localhost:8080 python -m app.api
+#
+# Annotations are kept in memory. A fraction fail_rate of the PUTs fail with a 503, to exercise the retries.
+import argparse
+import os
+import random
+import secrets
+
+import uvicorn
+from fastapi import Body, Depends, FastAPI
+from fastapi.responses import JSONResponse
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+
+
+def create_app(user="test", password="test", fail_rate=0.0):
+    app = FastAPI()
+    app.state.annotations = {}
+    app.state.requests = 0
+    security = HTTPBasic()
+
+    def check(credentials: HTTPBasicCredentials = Depends(security)):
+        if not (secrets.compare_digest(credentials.username, user) and
+                secrets.compare_digest(credentials.password, password)):
+            return False
+        return True
+
+    @app.put("/metadata-manager/annotation-dataset/{dataset_id}/{annotation_id}")
+    def put_annotation(dataset_id: str, annotation_id: str, payload: dict = Body(...), authorized: bool = Depends(check)):
+        app.state.requests += 1
+        if not authorized:
+            return JSONResponse(status_code=401, content={"error": "Invalid credentials"})
+        if random.random() < fail_rate:
+            return JSONResponse(status_code=503, content={"error": "Injected failure"})
+        app.state.annotations.setdefault(dataset_id, {})[annotation_id] = payload
+        return {"datasetId": dataset_id, "annotationId": annotation_id,
+                "denialConstraints": len(payload.get("denialConstraints", []))}
+
+    @app.get("/metadata-manager/annotation-dataset/{dataset_id}")
+    def list_annotations(dataset_id: str):
+        return app.state.annotations.get(dataset_id, {})
+
+    @app.get("/metadata-manager/annotation-dataset/{dataset_id}/{annotation_id}")
+    def get_annotation(dataset_id: str, annotation_id: str):
+        annotation = app.state.annotations.get(dataset_id, {}).get(annotation_id)
+        if annotation is None:
+            return JSONResponse(status_code=404, content={"error": f"Unknown annotation: {annotation_id}"})
+        return annotation
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(os.getenv("METADATA_USER", "test"), os.getenv("METADATA_PASS", "test"), args.fail_rate),
+                host="0.0.0.0", port=args.port)
@@ -0,0 +1,54 @@
+# bench_csv.py
+# Load time of CSV files with the pandas loader (Dataset default) and the chunked, typed pyarrow loader, for the first
+# rows used by discovery and for the whole file.
+#
+#   python benchmarks/bench_csv.py --mb 100 --rows 2048
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from core.dataset import Dataset
+from bench_evidence import make_table, timed
+
+
+def write_csv(path, mb, seed=0):
+    # Appends chunks of the synthetic table until the file reaches mb megabytes
+    chunk, header = 1 << 18, True
+    with open(path, "w") as f:
+        while f.tell() < mb * (1 << 20):
+            make_table(chunk, seed).to_csv(f, index=False, header=header)
+            header, seed = False, seed + 1
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=2048, help="rows read by discovery")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.csv")
+        write_csv(path, args.mb)
+        print(f"{os.path.getsize(path) / (1 << 20):.0f} MB")
+
+        print(f"{'rows':>10} {'pandas (s)':>11} {'arrow (s)':>10} {'speedup':>8}")
+        for nrows in [args.rows, None]:
+            times = {}
+            for loader in ["pandas", "arrow"]:
+                times[loader] = min(timed(lambda: Dataset(path, loader=loader, nrows=nrows, encoding='unicode_escape'))
+                                    for _ in range(args.repeat))
+            a = Dataset(path, nrows=nrows, encoding='unicode_escape')
+            b = Dataset(path, loader="arrow", nrows=nrows)
+            assert a.df.equals(b.df) and a.types == b.types, "loaders differ"
+            label = nrows if nrows is not None else len(a.df)
+            print(f"{label:>10} {times['pandas']:>11.3f} {times['arrow']:>10.3f} "
+                  f"{times['pandas'] / times['arrow']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
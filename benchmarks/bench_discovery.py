@@ -0,0 +1,132 @@
+# bench_discovery.py
+# Runs discover_dcs ("all"), discover_keys ("keys", the engine of the unique endpoints) and discover_unique_constraints
+# ("unique", the evidence-based search) over a grid of row counts and depths, on a synthetic table with planted
+# constraints (see synthetic.py), and reports the time of every phase, the peak traced
+# memory and the precision and recall of the DCs found against the planted ones. The report is written as JSON; given
+# the report of a previous run as --baseline, the time and recall of every run are compared against it.
+#
+#   python benchmarks/bench_discovery.py --rows 1000 2000 --depths 2 3 --out report.json
+#   python benchmarks/bench_discovery.py --rows 1000 2000 --depths 2 3 --baseline report.json
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from synthetic import make_synthetic
+from core.dc_discovery import discover_dcs
+from core.key_discovery import discover_keys
+from core.operator_predicate import Predicate, initialize_operators
+from core.stats import Stats
+from core.unique_dc_discovery import discover_unique_constraints
+from core.validation import parse_dc
+
+# Planted DCs each kind of run is scored against
+PLANTED = {"all": "all", "keys": "unique", "unique": "unique"}
+
+# Operator of a predicate once t0 and t1 are swapped
+CONVERSE = {"==": "==", "<>": "<>", "<": ">", ">": "<", "<=": ">=", ">=": "<="}
+
+
+def implies(dc1, dc2):
+    # dc1 implies dc2 when every predicate of dc1 holds whenever some predicate of dc2 does
+    return all(any(p.impliesPred(q) for q in dc2) for p in dc1)
+
+
+def variants(line, opmap):
+    # Predicates of a DC and of the same DC with t0 and t1 swapped
+    preds = parse_dc(line, opmap)
+    return preds, [Predicate(p.r, opmap[CONVERSE[repr(p.op)]], p.l) for p in preds]
+
+
+def score(found, planted, opmap):
+    """Precision (DCs found implied by a planted DC) and recall (planted DCs implied by a DC found) of a discovery
+    run, and the planted DCs missed."""
+    found = [variants(dc, opmap)[0] for dc in found]
+    planted = {dc: variants(dc, opmap) for dc in planted}
+    correct = sum(any(implies(dc, p) for variant in planted.values() for p in variant) for dc in found)
+    missed = [line for line, variant in planted.items() if not any(implies(dc, p) for dc in found for p in variant)]
+    precision = correct / len(found) if found else 1.0
+    return precision, 1 - len(missed) / len(planted), missed
+
+
+def run(kind, path, rows, depth, epsilon):
+    stats = Stats()
+    tracemalloc.start()
+    start = time.perf_counter()
+    if kind == "all":
+        dcs = discover_dcs(path, rows, depth, epsilon=epsilon, stats=stats)
+    elif kind == "keys":
+        dcs = discover_keys(path, rows, depth, epsilon=epsilon, stats=stats)
+    else:
+        dcs = discover_unique_constraints(path, rows, depth, epsilon=epsilon, stats=stats)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    report = stats.asdict()
+    counters = {name: value for name, value in report.items()
+                if name not in ("phases", "peak_rss_growth_bytes", "process_peak_rss_bytes")}
+    return dcs, {"seconds": elapsed, "phases": {name: entry["seconds"] for name, entry in report["phases"].items()},
+                 "peak_bytes": peak, "counters": counters}
+
+
+def compare(runs, baseline):
+    # Time and recall of every run against the run of the baseline with the same kind, rows and depth
+    before = {(r["kind"], r["rows"], r["depth"]): r for r in baseline["runs"]}
+    print(f"\n{'kind':>6} {'rows':>6} {'depth':>5} {'time (s)':>9} {'baseline':>9} {'speedup':>8} {'recall':>7} "
+          f"{'baseline':>9}")
+    for r in runs:
+        old = before.get((r["kind"], r["rows"], r["depth"]))
+        if old is not None:
+            print(f"{r['kind']:>6} {r['rows']:>6} {r['depth']:>5} {r['seconds']:>9.2f} {old['seconds']:>9.2f} "
+                  f"{old['seconds'] / r['seconds']:>8.2f} {r['recall']:>7.2f} {old['recall']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 2000])
+    parser.add_argument("--depths", type=int, nargs="+", default=[2, 3])
+    parser.add_argument("--kinds", nargs="+", choices=list(PLANTED), default=list(PLANTED))
+    parser.add_argument("--columns", type=int, default=2, help="noise columns, besides the planted ones")
+    parser.add_argument("--cardinality", type=int, default=50)
+    parser.add_argument("--noise", type=float, default=0.0, help="fraction of rows violating each planted DC")
+    parser.add_argument("--epsilon", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="discovery_report.json")
+    parser.add_argument("--baseline")
+    args = parser.parse_args()
+
+    _, opmap, _ = initialize_operators()
+    config = {name: value for name, value in vars(args).items() if name not in ("out", "baseline")}
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.csv")
+        df, planted = make_synthetic(max(args.rows), args.columns, args.cardinality, args.noise, args.seed)
+        df.to_csv(path, index=False)
+
+        print(f"{'kind':>6} {'rows':>6} {'depth':>5} {'time (s)':>9} {'peak MB':>8} {'DCs':>6} {'precision':>9} "
+              f"{'recall':>7}")
+        for kind in args.kinds:
+            for rows in args.rows:
+                for depth in args.depths:
+                    dcs, measures = run(kind, path, rows, depth, args.epsilon)
+                    precision, recall, missed = score(dcs, planted[PLANTED[kind]], opmap)
+                    runs.append({"kind": kind, "rows": rows, "depth": depth, **measures, "dcs": len(dcs),
+                                 "precision": precision, "recall": recall, "missed": missed})
+                    print(f"{kind:>6} {rows:>6} {depth:>5} {measures['seconds']:>9.2f} "
+                          f"{measures['peak_bytes'] / 2**20:>8.1f} {len(dcs):>6} {precision:>9.2f} {recall:>7.2f}")
+
+    with open(args.out, "w") as f:
+        json.dump({"config": config, "planted": planted, "runs": runs}, f, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            compare(runs, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# bench_evidence.py
+# Compares the vectorized evidence builder (Dataset.buildEvi) and its "derived" mode against the per-row loop
+# (Dataset.buildEviLoop).
+#
+#   python benchmarks/bench_evidence.py --sizes 1000 2000 5000 10000
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from core.dataset import Dataset
+
+
+def make_table(n, seed=0):
+    rng = np.random.default_rng(seed)
+    zips = rng.integers(0, 500, n)
+    salary = rng.integers(1000, 100000, n)
+    return pd.DataFrame({
+        "Zip(String)": zips.astype(str),
+        "State(String)": ["S" + str(z // 50) for z in zips],
+        "Salary(Integer)": salary,
+        "Rate(Double)": (salary // 20000) * 2.5,
+        "Status(String)": rng.choice(["S", "M"], n),
+        "Exemp(Integer)": rng.integers(0, 4, n),
+    })
+
+
+def load(path, n):
+    ds = Dataset(path, nrows=n, encoding='unicode_escape')
+    ds.buildPLIs()
+    ds.buildPreds()
+    return ds
+
+
+def timed(f):
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 5000, 10000])
+    parser.add_argument("--max-loop-rows", type=int, default=10000, help="skip the per-row loop above this size")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'preds':>6} {'loop (s)':>10} {'vectorized (s)':>15} {'derived (s)':>12} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            path = os.path.join(tmp, f"bench_{n}.csv")
+            make_table(n).to_csv(path, index=False)
+            ds = load(path, n)
+
+            vec = timed(ds.buildEvi)
+            evi, probs = ds.evi, ds.predProbs
+
+            der = timed(lambda: ds.buildEvi("derived"))
+            assert all(np.array_equal(a, b) for a, b in zip(evi, ds.evi)), "derived evidence differs"
+
+            if n <= args.max_loop_rows:
+                loop = timed(ds.buildEviLoop)
+                assert all(np.array_equal(a, b) for a, b in zip(evi, ds.evi)), "evidence differs"
+                assert probs == ds.predProbs, "predProbs differ"
+                print(f"{n:>8} {len(ds.preds):>6} {loop:>10.2f} {vec:>15.2f} {der:>12.2f} {loop / der:>7.1f}x")
+            else:
+                print(f"{n:>8} {len(ds.preds):>6} {'-':>10} {vec:>15.2f} {der:>12.2f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
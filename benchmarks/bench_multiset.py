@@ -0,0 +1,49 @@
+# bench_multiset.py
+# Compares counting over the packed evidence of every tuple pair against counting over the evidence multiset (the
+# distinct evidences and their multiplicities): distinct evidences, time to collapse the pairs, and counting time.
+#
+#   python benchmarks/bench_multiset.py --rows 2000 4000 --depths 3 4
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_evidence import make_table
+from core.dc_discovery import count_predicate_sets, load_dataset
+
+
+def timed(f, *args):
+    start = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[2000, 4000])
+    parser.add_argument("--depths", type=int, nargs="+", default=[3, 4])
+    args = parser.parse_args()
+
+    print(f"{'rows':>6} {'pairs':>10} {'evidences':>9} {'collapse (s)':>12} {'depth':>5} {'packed (s)':>10} "
+          f"{'multiset (s)':>12}")
+    for n in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.csv")
+            make_table(n).to_csv(path, index=False)
+            packed = load_dataset(path, n)
+            multiset = load_dataset(path, n, sparse_density=None)
+        _, collapse = timed(multiset.collapseEvi)
+        for depth in args.depths:
+            expected, packedTime = timed(count_predicate_sets, packed, depth)
+            counts, multisetTime = timed(count_predicate_sets, multiset, depth)
+            assert counts == expected, "the evidence multiset changed the counts"
+            print(f"{n:>6} {packed.eviSize:>10} {len(multiset.eviWeights):>9} {collapse:>12.2f} {depth:>5} "
+                  f"{packedTime:>10.2f} {multisetTime:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# bench_sparse.py
+# Compares packed evidence against hybrid evidence, where the predicates satisfied by at most a fraction of the tuple
+# pairs are stored as sorted pair indices: evidence size, sparse predicates and counting time.
+#
+#   python benchmarks/bench_sparse.py --rows 4000 --depth 3 --densities 0.001 0.004 0.016
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_evidence import make_table
+from core.dc_discovery import count_predicate_sets, load_dataset
+from core.evidence import is_sparse
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=4000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--densities", type=float, nargs="+", default=[1 / 1024, 1 / 256, 1 / 64])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.csv")
+        make_table(args.rows).to_csv(path, index=False)
+        runs = [("packed", load_dataset(path, args.rows, sparse_density=None))]
+        runs += [(f"{density:.4f}", load_dataset(path, args.rows, sparse_density=density)) for density in args.densities]
+
+    print(f"{'density':>8} {'sparse':>6} {'evidence MB':>12} {'time (s)':>9}")
+    expected = None
+    for name, ds in runs:
+        start = time.perf_counter()
+        counts = count_predicate_sets(ds, args.depth)
+        elapsed = time.perf_counter() - start
+        expected = expected or counts
+        assert counts == expected, "sparse evidence changed the counts"
+        sparse = sum(is_sparse(bits) for bits in ds.evi)
+        size = sum(bits.nbytes for bits in ds.evi)
+        print(f"{name:>8} {sparse:>6} {size / 2**20:>12.1f} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
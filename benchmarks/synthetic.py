@@ -0,0 +1,62 @@
+# synthetic.py
+# Seeded synthetic tables with planted constraints, for benchmarks that measure the recall of discovery:
+#   - a key Id, and a composite key (Block, Slot);
+#   - an FD A -> B;
+#   - an order dependency between Price and Tax (Tax increases with Price);
+#   - columns Noise1, Noise2, ... of random values, with no planted constraint.
+# A fraction noise of the rows breaks each planted constraint.
+
+import numpy as np
+import pandas as pd
+
+
+def dc(*preds):
+    # DC as printed by discovery, from (column, op) predicates over the same column
+    return "¬(" + " ^ ".join(f"t0.{col} {op} t1.{col}" for col, op in preds) + ")"
+
+
+def planted_dcs():
+    """Planted DCs, by the kind of discovery expected to find them."""
+    key, block, slot = "Id(Integer)", "Block(Integer)", "Slot(Integer)"
+    a, b = "A(Integer)", "B(Integer)"
+    price, tax = "Price(Integer)", "Tax(Integer)"
+    keys = [dc((key, "==")), dc((block, "=="), (slot, "=="))]
+    fds = [dc((a, "=="), (b, "<>"))]
+    # Tax is a strictly increasing function of Price, so Price and Tax are ordered the same way
+    order = [dc((price, "<"), (tax, ">=")), dc((price, ">"), (tax, "<=")), dc((price, "<="), (tax, ">")),
+             dc((price, ">="), (tax, "<")), dc((price, "=="), (tax, "<>")), dc((price, "<>"), (tax, "=="))]
+    return {"unique": keys, "all": keys + fds + order}
+
+
+def make_synthetic(rows, columns=2, cardinality=50, noise=0.0, seed=0):
+    """DataFrame of rows rows with the planted constraints, columns random noise columns, cardinality distinct values
+    per column (A, B, Price and the noise columns), and a fraction noise of the rows violating each constraint.
+    Returns it with planted_dcs()."""
+    rng = np.random.default_rng(seed)
+    slots = max(2, int(np.ceil(np.sqrt(rows))))
+    a = rng.integers(0, cardinality, rows)
+    fd = rng.integers(0, max(2, cardinality // 2), cardinality)
+    price = rng.integers(0, cardinality, rows) * 10
+    rowIds = rng.permutation(rows)
+    df = pd.DataFrame({
+        "Id(Integer)": rng.permutation(rows),
+        "Block(Integer)": rowIds // slots,
+        "Slot(Integer)": rowIds % slots,
+        "A(Integer)": a,
+        "B(Integer)": fd[a],
+        "Price(Integer)": price,
+        "Tax(Integer)": price * 2 + 5,
+    })
+    for i in range(columns):
+        df[f"Noise{i + 1}(Integer)"] = rng.integers(0, cardinality, rows)
+
+    # Every constraint is broken on its own random rows
+    broken = int(round(noise * rows))
+    if broken:
+        for col in ["Id(Integer)", "Slot(Integer)"]:
+            dirty = rng.choice(rows, broken, replace=False)
+            df.loc[dirty, col] = df[col].to_numpy()[(dirty + 1) % rows]
+        df.loc[rng.choice(rows, broken, replace=False), "Block(Integer)"] = df["Block(Integer)"].to_numpy()[0]
+        df.loc[rng.choice(rows, broken, replace=False), "B(Integer)"] = cardinality + 1
+        df.loc[rng.choice(rows, broken, replace=False), "Tax(Integer)"] = -1
+    return df, planted_dcs()
@@ -0,0 +1,62 @@
+# budget.py
+
+import os
+import resource
+import time
+
+# Memory is read from /proc every MEMORY_CHECK_EVERY checks, as it costs a system call
+MEMORY_CHECK_EVERY = 64
+
+
+def resident_bytes():
+    # Current resident memory of the process, or its peak where /proc is not available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """An allocation would take the resident memory above the limit of a Budget."""
+
+
+class Budget:
+    """Wall-clock (seconds) and memory (bytes) limits of a discovery run, counted from the creation of the Budget. The
+    memory is the growth of the resident memory of the process over its level when the Budget was created, so what was
+    already allocated (e.g. a cache) is not charged to the run. Searches call exceeded() as they go and stop once a limit
+    is hit; the Budget then stays exhausted, so the caller knows the result is partial."""
+
+    def __init__(self, seconds=None, memory=None):
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+        self.memory = memory
+        self.baseline = resident_bytes() if memory is not None else 0
+        self.exhausted = False
+        self.reason = None
+        self.checks = 0
+
+    def used(self):
+        # Growth of the resident memory since the Budget was created
+        return max(resident_bytes() - self.baseline, 0)
+
+    def exceeded(self):
+        if self.exhausted:
+            return True
+        self.checks += 1
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.exhausted, self.reason = True, "time"
+        elif (self.memory is not None and self.checks % MEMORY_CHECK_EVERY == 1
+              and self.used() > self.memory):
+            self.exhausted, self.reason = True, "memory"
+        return self.exhausted
+
+    def reserve(self, nbytes, what):
+        # Before a large allocation: raises MemoryBudgetExceeded (and exhausts the Budget) if nbytes more would take the
+        # memory of the run above the limit. Always reads the resident memory, as such allocations are few.
+        if self.memory is None:
+            return
+        used = self.used()
+        if used + nbytes > self.memory:
+            self.exhausted, self.reason = True, "memory"
+            raise MemoryBudgetExceeded(f"{what} needs {nbytes / (1 << 20):.1f} MB, with {used / (1 << 20):.1f} MB "
+                                       f"used by the run and a memory limit of {self.memory / (1 << 20):.1f} MB")
@@ -0,0 +1,41 @@
+# counting.py
+
+from core.evidence import intersect
+from core.utils import LRUCache
+
+
+class LazyCounts:
+    """Counts of predicate sets, computed the first time they are read and memoized in a bounded LRU."""
+
+    def __init__(self, ds, size):
+        self.ds = ds
+        self.cache = LRUCache(size)
+        self.computed = 0
+        self.hits = 0
+
+    def extend(self, npreds, x, pred):
+        # Bitset of npreds from the bitset x of its parent set, counting it if not cached yet
+        newx = intersect(x, self.ds.evi[pred])
+        if npreds not in self.cache:
+            self.cache[npreds] = self.ds.count(newx)
+            self.computed += 1
+        return newx
+
+    def prefetch(self, npreds, x, pred):
+        # Count npreds from the bitset x of its parent set, unless already cached
+        if npreds not in self.cache:
+            self.extend(npreds, x, pred)
+
+    def __getitem__(self, preds):
+        count = self.cache.get(preds)
+        if count is not None:
+            self.hits += 1
+            return count
+        # Not cached (or evicted): intersect the evidence of its predicates
+        # Rarest first, so that the bitset turns sparse as early as possible
+        x = self.ds.fullBits()
+        for pred in sorted(preds, key=self.ds.predProbs.__getitem__):
+            x = intersect(x, self.ds.evi[pred])
+        count = self.cache[preds] = self.ds.count(x)
+        self.computed += 1
+        return count
@@ -3,67 +3,56 @@ import os
 
 import pandas as pd
 import numpy as np
-import pyarrow.parquet as pq
-import warnings
 
-import re
 from core.operator_predicate import initialize_operators
 from core.operator_predicate import Predicate
+from core.evidence import (BLOCK_PAIRS, SPARSE_DENSITY, build_evidence, derive_evidence, encode_values,
+                           evidence_multiset, full_bits, is_sparse, joint_codes, popcount, sparse_bits, weighted_count)
+from core.evidence_store import EvidenceStore, open_store
+from core.loaders import cast_series, map_dtype_to_pytype, parse_header, read_csv_arrow, read_parquet, select_columns
+from core.sampling import cluster_rows, stratified_pairs
+from core.stats import sample_memory
 
 
 class Dataset:
-    def __init__(self, file, **args):
-        ext = os.path.splitext(file)[-1].lower()
-        if ext == ".csv":
-            self.columns = pd.read_csv(file, nrows=0).columns
-            self.header = [re.match(r'([^\(\)]*)(?:\(| )([^\(\)]*)\)?', col) for col in self.columns]
-            self.names = [match[1] for match in self.header]
-            typeMap = {'String': str, 'Integer': float, 'Int': float, 'Double': float, 'int': float, 'str': str,
-                       'float': float}
-            self.types = {col: typeMap[match[2]] for col, match in zip(self.columns, self.header)}
-
-            self.df = pd.read_csv(file, **args, dtype=self.types)
-            for i, col in enumerate(self.columns):
-                self.df[col] = self.df[col].astype(self.types[col])
+    def __init__(self, file, columns=None, exclude=None, sample=False, seed=0, loader="pandas", types=None, **args):
+        # file is a path or a seekable binary file object with a name (e.g. an object streamed from MinIO).
+        # columns and exclude select the columns to load; with sample, rows are drawn across the file (Parquet, or CSV
+        # with the "arrow" loader) instead of being the first ones. With types, the Python types of the columns in a
+        # previous load, the columns are cast to them instead of being typed again (ValueError if they cannot be).
+        name = file if isinstance(file, (str, os.PathLike)) else file.name
+        ext = os.path.splitext(name)[-1].lower()
+        if ext == ".csv" and loader == "arrow":
+            # Typed, chunked read with pyarrow: stops after nrows rows, and columns are not re-cast afterwards
+            self.df = read_csv_arrow(file, args.get("nrows"), columns, exclude, sample, seed)
+            self.columns = self.df.columns
+            self.names, annotated = parse_header(self.columns)
+            self.header = [[name, annotated[col]] for name, col in zip(self.names, self.columns)]
+            self.types = {col: annotated[col] or map_dtype_to_pytype(self.df[col].dtype) for col in self.columns}
+
+        elif ext == ".csv":
+            if loader != "pandas":
+                raise ValueError(f"Unsupported loader: {loader}")
+            if sample:
+                raise ValueError("Row sampling of CSV files needs the arrow loader")
+            self.columns = pd.Index(select_columns(pd.read_csv(file, nrows=0).columns, columns, exclude))
+            if hasattr(file, "seek"):
+                file.seek(0)
+            # Columns without a Name(Type) annotation are typed by pandas
+            self.names, annotated = parse_header(self.columns)
+            self.header = [[name, annotated[col]] for name, col in zip(self.names, self.columns)]
+            dtypes = {col: t for col, t in annotated.items() if t is not None}
+            # Text columns of a previous load are read as text, so that e.g. "01" is not read as 1
+            read = dict(dtypes, **{col: str for col, t in (types or {}).items() if t is str and col not in dtypes})
+
+            self.df = pd.read_csv(file, **args, usecols=list(self.columns), dtype=read)
+            for col in dtypes:
+                self.df[col] = self.df[col].astype(dtypes[col])
+            self.types = {col: annotated[col] or map_dtype_to_pytype(self.df[col].dtype) for col in self.columns}
 
         elif ext == ".parquet":
-            df = pq.read_table(file).to_pandas().iloc[:2048]
-
-            def is_all_integers(series):
-                return all((x == int(x)) for x in series.dropna())
-
-            def infer_series_type(s):
-                numeric = pd.to_numeric(s, errors="coerce")
-                if numeric.notna().sum() > 0:
-                    if is_all_integers(numeric):
-                        return numeric.astype("Int64")
-                    else:
-                        return numeric.astype("Float64")
-
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    datetime = pd.to_datetime(s, errors="coerce")
-                if datetime.notna().sum() > 0 and datetime.notna().sum() >= len(s) * 0.5:
-                    return datetime
-
-                return s
-
-            for col in df.columns:
-                df[col] = infer_series_type(df[col])
-
-            def map_dtype_to_pytype(dtype):
-                if pd.api.types.is_string_dtype(dtype):
-                    return str
-                elif pd.api.types.is_integer_dtype(dtype):
-                    return int
-                elif pd.api.types.is_float_dtype(dtype):
-                    return float
-                elif pd.api.types.is_bool_dtype(dtype):
-                    return bool
-                elif pd.api.types.is_datetime64_any_dtype(dtype):
-                    return pd.Timestamp
-                else:
-                    return object
+            # Only the footer and the needed column chunks are read. Columns are typed from the Arrow schema.
+            df = read_parquet(file, args.get("nrows"), columns, exclude, sample, seed)
 
             self.df = df
             self.columns = df.columns
@@ -74,57 +63,269 @@ class Dataset:
         else:
             raise ValueError(f"Unsupported file extension: {ext}")
 
-        operatorMap, _, _ = initialize_operators()  # Added
-        self.eq, self.ne, self.ge, self.le, self.gt, self.lt = operatorMap.values()  # Added
+        if types is not None:
+            for col in self.columns:
+                if col in types:
+                    self.df[col] = cast_series(self.df[col], types[col], col)
+                    self.types[col] = types[col]
+
+        self.numRows = len(self.df)
+
+        operatorMap, self.opmap, _ = initialize_operators()  # Added
+        self.eq, self.ne = operatorMap["EQUAL"], operatorMap["UNEQUAL"]
+        self.ge, self.le = operatorMap["GREATER_EQUAL"], operatorMap["LESS_EQUAL"]
+        self.gt, self.lt = operatorMap["GREATER"], operatorMap["LESS"]
+
+        # Sampled tuple pairs (left, right) and their count segments, see samplePairs. None for all tuple pairs.
+        self.pairs = None
+        self.eviSegments = None
+        # Path of the memory-mapped evidence store backing self.evi, if any
+        self.eviStore = None
+        # Multiplicities of the distinct evidences when the evidence is a multiset (see collapseEvi), else None
+        self.eviWeights = None
+
+    def __len__(self):
+        return self.numRows
 
     def randRows(self, n):
-        ids = np.random.randint(0, len(self.df), n)
-        return self.df.iloc[ids]
+        ids = np.random.randint(0, len(self), n)
+        return pd.DataFrame({col: self.column(col).iloc[ids].values for col in self.columns})
 
     def randFields(self, n):
         return pd.DataFrame(
-            {col: self.df[col].iloc[np.random.randint(0, len(self.df), n)].values for col in self.df.columns})
+            {col: self.column(col).iloc[np.random.randint(0, len(self), n)].values for col in self.columns})
 
     def buildPLIs(self):
-        self.PLI = {col: self.df.groupby(by=col).groups for col in self.df}
-        self.PLILen = {col: np.array([len(self.PLI[col][v]) for v in self.PLI[col]]) for col in self.df}
-        self.vals = {col: np.array([v for v in self.PLI[col]]) for col in self.df}
+        # Dictionary encoding of every column: integer codes over its sorted distinct values (vals), -1 for nulls.
+        # The PLI clusters are the rows sharing a code (see pli), and PLILen their sizes.
+        self.codes, self.vals, self.PLILen = {}, {}, {}
+        for col in self.columns:
+            self.codes[col], self.vals[col] = encode_values(self.df[col])
+            valid = self.codes[col][self.codes[col] >= 0]
+            self.PLILen[col] = np.bincount(valid, minlength=len(self.vals[col]))
+
+    def pli(self, col):
+        # Rows of every PLI cluster of col, in the order of vals
+        order, starts = cluster_rows(self.codes[col], self.PLILen[col])
+        return [order[start:start + size] for start, size in zip(starts, self.PLILen[col])]
+
+    def appendRows(self, other):
+        # Appends the rows of another encoded Dataset with the same columns, merging the dictionaries. The codes of the
+        # existing rows are remapped, and as the merge preserves the order of the values, their comparisons are unchanged.
+        if list(other.columns) != list(self.columns):
+            raise ValueError("Appended rows must have the same columns")
+        # Every column is merged before any is replaced, so that a failed merge leaves the Dataset unchanged
+        merged = {}
+        for col in self.columns:
+            vals = np.union1d(self.vals[col], other.vals[col])
+            old = np.append(np.searchsorted(vals, self.vals[col]), -1).astype(np.int32)
+            new = np.append(np.searchsorted(vals, other.vals[col]), -1).astype(np.int32)
+            merged[col] = np.concatenate([old[self.codes[col]], new[other.codes[col]]]), vals
+        for col, (codes, vals) in merged.items():
+            self.codes[col], self.vals[col] = codes, vals
+            self.PLILen[col] = np.bincount(codes[codes >= 0], minlength=len(vals))
+        if self.df is not None:
+            rows = other.df if other.df is not None else pd.DataFrame({col: other.column(col) for col in other.columns})
+            self.df = pd.concat([self.df, rows], ignore_index=True)
+        self.numRows += len(other)
+
+    def compact(self):
+        # Drops the DataFrame once the columns are encoded by buildPLIs. Predicates and evidence only need the codes.
+        self.df = None
+
+    def column(self, col):
+        # Values of a column, decoded from its codes if the Dataset is compact (nulls as NaN)
+        if self.df is not None:
+            return self.df[col]
+        return pd.Series(self.vals[col]).reindex(self.codes[col]).reset_index(drop=True)
 
     def shuffle(self):
-        self.df = self.randFields(len(self.df))
+        self.df = self.randFields(len(self))
 
-    def buildPreds(self):
+    def buildPreds(self, cross=False, minShared=0.3, minSelectivity=0.0):
         self.preds = []
         self.predMap = {}
         self.colPreds = []
         self.predCols = []
 
         for col in self.columns:
-            ops = [self.eq, self.ne] if self.types[col] == str else [self.eq, self.ne, self.gt, self.ge, self.lt, self.le]
-            self.colPreds.append([])
-            for op in ops:
-                pred = Predicate(col, op, col)
-                self.predMap[(col, op, col)] = len(self.preds)
-                self.predCols.append(len(self.colPreds))
-                self.colPreds[-1].append(len(self.preds))
-                self.preds.append(pred)
-
-    def buildEvi(self):
-        n = len(self.df)
+            ops = [self.eq, self.ne] if self.types[col] == str else [self.eq, self.ne, self.lt, self.le, self.gt, self.ge]
+            self.addPreds(col, ops, col)
+
+        self.predStats = {"column_pairs": 0, "incompatible": 0, "low_overlap": 0, "candidates": 0, "pruned": 0}
+        if cross:
+            self.buildCrossPreds(minShared, minSelectivity)
+
+    def addPreds(self, l, ops, r):
+        self.colPreds.append([])
+        for op in ops:
+            pred = Predicate(l, op, r)
+            self.predMap[(l, op, r)] = len(self.preds)
+            self.predCols.append(len(self.colPreds))
+            self.colPreds[-1].append(len(self.preds))
+            self.preds.append(pred)
+        return self.colPreds[-1]
+
+    def typeGroup(self, col):
+        return float if self.types[col] in (int, float) else self.types[col]
+
+    def buildCrossPreds(self, minShared, minSelectivity):
+        # Predicates t0.A op t1.B over type-compatible columns. As every tuple pair is evaluated in both orders,
+        # t0.B op t1.A adds nothing over t0.A op' t1.B, so only one direction is generated for each pair of columns.
+        # Requires the PLIs.
+        stats = self.predStats
+        for i, a in enumerate(self.columns):
+            for b in self.columns[i + 1:]:
+                stats["column_pairs"] += 1
+                kind = self.typeGroup(a)
+                if kind != self.typeGroup(b) or kind not in (str, float, pd.Timestamp):
+                    stats["incompatible"] += 1
+                    continue
+                va, vb = self.vals[a], self.vals[b]
+                if len(va) == 0 or len(vb) == 0:
+                    stats["incompatible"] += 1
+                    continue
+
+                # Usual heuristic: equality needs a share of common values, order comparisons overlapping ranges.
+                ops = []
+                if len(np.intersect1d(va, vb)) / min(len(va), len(vb)) >= minShared:
+                    ops += [self.eq, self.ne]
+                if kind != str:
+                    lo, hi = max(va[0], vb[0]), min(va[-1], vb[-1])
+                    width = min(va[-1] - va[0], vb[-1] - vb[0])
+                    overlap = (hi - lo) / width if width else float(lo <= hi)
+                    if overlap >= minShared:
+                        ops += [self.lt, self.le, self.gt, self.ge]
+                if not ops:
+                    stats["low_overlap"] += 1
+                    continue
+
+                # Expected selectivity from the value frequencies in the PLIs. Predicates expected to hold for none
+                # (or all) of the tuple pairs cannot contribute to a DC.
+                values = np.union1d(va, vb)
+                fa, fb = np.zeros(len(values)), np.zeros(len(values))
+                fa[np.searchsorted(values, va)] = self.PLILen[a]
+                fb[np.searchsorted(values, vb)] = self.PLILen[b]
+                kept = []
+                for op in ops:
+                    stats["candidates"] += 1
+                    exp = op.expected(fa, fb)
+                    if exp <= minSelectivity or exp >= 1 - minSelectivity:
+                        stats["pruned"] += 1
+                        continue
+                    kept.append((op, exp))
+                if kept:
+                    for p, (op, exp) in zip(self.addPreds(a, [op for op, _ in kept], b), kept):
+                        self.preds[p].exp = exp
+
+    def pairCodes(self, l, r):
+        if l == r:
+            return self.codes[l], self.codes[l]
+        return joint_codes(self.codes[l], self.vals[l], self.codes[r], self.vals[r])
+
+    def samplePairs(self, budget, seed=0):
+        # Restricts the evidence to a stratified sample of about budget tuple pairs. Requires the PLIs.
+        sample = stratified_pairs([self.codes[col] for col in self.columns],
+                                  [self.PLILen[col] for col in self.columns], budget, seed=seed)
+        self.pairs, self.eviSegments = sample if sample is not None else (None, None)
+
+    def count(self, x):
+        # Number of tuple pairs set in an evidence bitset. With sampled pairs, an unbiased estimate of the number of
+        # sampled pairs that would be set under uniform sampling.
+        if self.eviWeights is not None:
+            return weighted_count(x, self.eviWeights)
+        return popcount(x, self.eviSegments)
+
+    def fullBits(self):
+        # Bitset with every tuple pair (or every distinct evidence of the multiset) set
+        return full_bits(self.eviSize if self.eviWeights is None else len(self.eviWeights))
+
+    def buildEvi(self, mode="vectorized", store=None, budget=None, stats=None):
+        # With a store path, the bitsets are written to a memory-mapped evidence store as they are built, and self.evi
+        # holds views of it. With a Budget, the memory of the bitsets of every column is reserved before they are built.
+        # With a Stats, the resident memory is sampled once the bitsets of every column are built.
+        if mode not in ("vectorized", "derived"):
+            raise ValueError(f"Unsupported evidence mode: {mode}")
+        n = len(self)
+        m = len(self.preds)
+        self.eviSize = n * (n - 1) if self.pairs is None else len(self.pairs[0])
+        self.evi = [None] * m
+        self.eviWeights = None
+        self.predProbs = [None] * m
+        store = EvidenceStore(store, self.preds, self.eviSize) if store else None
+
+        for preds in self.colPreds:
+            if budget is not None:
+                budget.reserve(len(preds) * -(-self.eviSize // 8), f"Evidence of {self.preds[preds[0]].l}")
+            lcodes, rcodes = self.pairCodes(self.preds[preds[0]].l, self.preds[preds[0]].r)
+            ops = [self.preds[p].op for p in preds]
+            if mode == "derived":
+                bits = derive_evidence(lcodes, rcodes, ops, self.eq, self.gt, self.pairs)
+            else:
+                bits = build_evidence(lcodes, rcodes, ops, self.pairs)
+            for p, b in zip(preds, bits):
+                self.evi[p] = store.put(p, b) if store else b
+                self.predProbs[p] = self.count(b) / self.eviSize * 2
+            sample_memory(stats)
+        self.sortedPreds = sorted(range(len(self.predProbs)), key=lambda i: self.predProbs[i])
+        if store:
+            store.close(self)
+            self.eviStore = store.path
+
+    def sparsifyEvi(self, density=SPARSE_DENSITY, budget=None):
+        # Stores the evidence of the predicates satisfied by at most a fraction density of the tuple pairs as sorted
+        # pair indices (see evidence.intersect). The others stay packed.
+        for p, prob in enumerate(self.predProbs):
+            if prob / 2 <= density and not is_sparse(self.evi[p]):
+                if budget is not None:
+                    budget.reserve(int(prob / 2 * self.eviSize) * 8, "Sparse evidence")
+                self.evi[p] = sparse_bits(self.evi[p], self.eviSize)
+
+    def collapseEvi(self, budget=None, stats=None):
+        # Evidence multiset: tuple pairs satisfying the same predicates are grouped into one distinct evidence, and the
+        # bitsets are over the distinct evidences, counted with their multiplicities. Counts do not change, but on
+        # typical data there are a few thousand evidences instead of n*(n-1) tuple pairs. With a Budget, the memory of
+        # the evidence vectors of a block of pairs is reserved first. With a Stats, the resident memory is sampled after
+        # every block.
+        if budget is not None:
+            budget.reserve(min(self.eviSize, BLOCK_PAIRS) * (-(-len(self.evi) // 64) + 3) * 8, "Evidence multiset")
+        self.evi, self.eviWeights = evidence_multiset(self.evi, self.eviSize, self.eviSegments,
+                                                        sample=None if stats is None else stats.sample)
+        self.eviStore = None
+
+    def openEvi(self, path):
+        # Evidence from a store written by buildEvi, if it was built for this data, predicates and tuple pairs.
+        # Returns False otherwise.
+        stored = open_store(path, self)
+        if stored is None:
+            return False
+        self.evi, header = stored
+        self.eviWeights = None
+        self.eviSize = header["eviSize"]
+        self.predProbs = header["predProbs"]
+        self.sortedPreds = header["sortedPreds"]
+        self.eviSegments = [tuple(s) for s in header["eviSegments"]] if header["eviSegments"] else None
+        self.eviStore = path
+        return True
+
+    def buildEviLoop(self):
+        n = len(self)
         m = len(self.preds)
         self.eviSize = n * (n - 1)
         self.evi = [None] * m
+        self.eviWeights = None
         self.predProbs = [None] * m
 
         for p in range(m):
             pred = self.preds[p]
-            col = self.df[pred.l]
+            col = self.column(pred.l)
+            rcol = self.column(pred.r)
             evis = []
             for i in range(n):
                 c1 = col.iloc[i]
-                c2 = col.iloc[i + 1:n]
+                c2 = rcol.iloc[i + 1:n]
                 evis.append(pred.op(c1, c2))
-                c2 = col.iloc[:i]
+                c2 = rcol.iloc[:i]
                 evis.append(pred.op(c1, c2))
 
             allTPs = np.concatenate(evis)
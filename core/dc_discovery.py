@@ -2,29 +2,94 @@
 from core.dataset import Dataset
 from core.utils import powerset, y1, y2
 import numpy as np
-from core.denialconstraints import DenialConstraint
+from core.counting import LazyCounts
+from core.denialconstraints import DenialConstraint, reduce_dcs
+from core.evidence import SPARSE_DENSITY, intersect
+from core.parallel import parallel_counts
+from core.significance import SignificanceTest
+from core.stats import add, phase
 
-def discover_dcs(dataset_path, row_count=2048, depth=3):
-    # Load dataset
-    ds = Dataset(dataset_path, nrows=row_count, encoding='unicode_escape')
 
-    # Build Position List Indexes (PLIs)
-    ds.buildPLIs()
+def load_dataset(dataset_path, row_count=None, evidence_mode="vectorized", cross_columns=False, sample_pairs=None,
+                 evidence_store=None, columns=None, exclude_columns=None, sample_rows=False, loader="pandas", stats=None,
+                 sparse_density=SPARSE_DENSITY, multiset=False, min_selectivity=None, budget=None):
+    # Load dataset. By default the first 2048 rows, or the whole file when sampling tuple pairs.
+    # Optionally only some columns, and rows sampled across the file instead of the first ones.
+    # CSV files are read with pandas, or in typed chunks with pyarrow when loader is "arrow" (UTF-8 only).
+    # With stats, every phase below is timed.
+    # The evidence of the predicates satisfied by at most a fraction sparse_density of the tuple pairs is kept sparse
+    # (None to keep it all packed). With multiset, the tuple pairs are collapsed into their distinct evidences instead
+    # (see Dataset.collapseEvi).
+    # With a Budget with a memory limit, a run whose evidence would not fit is refused before it is built, and the
+    # larger allocations after it are checked too (MemoryBudgetExceeded).
+    if row_count is None and not sample_pairs:
+        row_count = 2048
+    with phase(stats, "load"):
+        ds = Dataset(dataset_path, columns=columns, exclude=exclude_columns, sample=sample_rows, loader=loader,
+                     nrows=row_count, encoding='unicode_escape')
 
-    # Build the predicates
-    ds.buildPreds()
+    # Build Position List Indexes (PLIs): every column is dictionary-encoded as integer codes, and the DataFrame is then
+    # dropped, as predicates and evidence only need the codes.
+    with phase(stats, "buildPLIs"):
+        ds.buildPLIs()
+        ds.compact()
 
-    # Build the evidence set
-    ds.buildEvi()
+    # Build the predicates. Optionally also over pairs of compatible columns (t0.A op t1.B), without the ones expected
+    # to hold for at most a fraction min_selectivity of the tuple pairs (or for all but that fraction). By default, the
+    # ones expected to hold for less than one tuple pair of the evidence (or for all of them).
+    if min_selectivity is None:
+        pairs = max(len(ds) * (len(ds) - 1), 1)
+        min_selectivity = 1 / min(sample_pairs or pairs, pairs)
+    with phase(stats, "buildPreds"):
+        ds.buildPreds(cross=cross_columns, minSelectivity=min_selectivity)
+    if cross_columns:
+        for name, value in ds.predStats.items():
+            add(stats, f"cross_{name}", value)
 
-    #Max size of predicate sets to search for
-    DCCounts={}
-    counts={}
+    # Optionally restrict the evidence to a stratified sample of tuple pairs, to bound its memory on large tables.
+    if sample_pairs:
+        with phase(stats, "samplePairs"):
+            ds.samplePairs(sample_pairs)
+
+    # Build the evidence set. In "derived" mode only == and > are compared, the other operators are derived from them.
+    # With an evidence store, reuse the evidence in it if it was built for the same data, or build it into the store.
+    with phase(stats, "buildEvi"):
+        if not (evidence_store and ds.openEvi(evidence_store)):
+            if budget is not None and not evidence_store:
+                n = len(ds)
+                pairs = n * (n - 1) if ds.pairs is None else len(ds.pairs[0])
+                budget.reserve(len(ds.preds) * -(-pairs // 8),
+                               f"Evidence of {len(ds.preds)} predicates over {pairs} tuple pairs")
+            ds.buildEvi(evidence_mode, store=evidence_store, budget=budget, stats=stats)
+        if sparse_density is not None and not multiset:
+            ds.sparsifyEvi(sparse_density, budget)
+    if multiset:
+        with phase(stats, "collapseEvi"):
+            ds.collapseEvi(budget, stats)
+        add(stats, "distinct_evidences", len(ds.eviWeights))
+    add(stats, "rows", len(ds))
+    add(stats, "predicates", len(ds.preds))
+    add(stats, "tuple_pairs", ds.eviSize)
+    add(stats, "evidence_bytes", sum(bits.nbytes for bits in ds.evi))
+    return ds
+
+
+def count_predicate_sets(ds, depth, workers=1, budget=None, counts=None):
+    #With counts, the counts of a previous call at a lower depth: they are extended with the deeper sets only, the sets
+    #already counted being traversed without being counted again.
+    known=-1 if not counts else max(map(len,counts))
+    counts={} if counts is None else counts
+    visited=set()
 
     #Recursive function that performs a DFS search across the space of predicate sets up to length 4.
     def search(preds,cols,x):
+        #Stop counting once the budget is exhausted. The counts are then incomplete.
+        if budget is not None and budget.exceeded():
+            return
+        visited.add(preds)
         #For every visited set of predicates, compute the proportion of tuple pairs it satisfies and store it.
-        counts[preds]=np.bitwise_count(x).sum() # bitwise_count before
+        if len(preds)>known:
+            counts[preds]=ds.count(x)
         #Stop the search if we are at max depth
         if len(preds)>=depth:
                 return
@@ -37,33 +102,70 @@ def discover_dcs(dataset_path, row_count=2048, depth=3):
                 #This is a predicate set we want to visit. Explore it only if it has not been visited already.
                 npreds=preds|{pred}
                 ncols=cols|{ncol}
-                if npreds in counts:
+                if npreds in visited:
                     continue
                 #This is an unvisited predicate set we want to visit. Filter the tuple pairs so as to keep those that satisfy the new set of predicates.
-                newx=np.bitwise_and(x,ds.evi[pred])
+                newx=intersect(x,ds.evi[pred])
                 #Recursive call
                 search(npreds,ncols,newx)
 
+    if workers > 1:
+        #Same counts, with the branches of the search (one per first predicate) split across a process pool.
+        return parallel_counts(ds,depth,workers,budget,counts,known)
+
     #Begin search:
     search(frozenset()  #Begin with an empty set of predicates
            ,frozenset(),#Begin with no columns having predicates on the current set, as it is empty
-           np.full((ds.eviSize//8,),255,dtype=np.uint8))#Begin with all tuple pairs fulfilling the predicate set, as there is no predicate to not fulfill. This gets filtered as predicates are added during the DFS.
+           ds.fullBits())#Begin with all tuple pairs fulfilling the predicate set, as there is no predicate to not fulfill. This gets filtered as predicates are added during the DFS.
+    return counts
+
 
-    DCCounts=counts
+def meets_tolerance(a1, b1, epsilon):
+    # A DC holds when no tuple pair satisfying the other predicates satisfies pred (a1 == 0), or approximately when
+    # they are fewer than a fraction epsilon of them
+    return a1 == 0 or a1 < epsilon * (a1 + b1)
 
-    DCResults = {}
 
-    counts = DCCounts
+def contains_accepted(npreds, accepted):
+    # True if a subset of npreds is already a DC: its branch only leads to implied DCs
+    return any(frozenset(sub) in accepted for sub in powerset(npreds))
+
+
+def significance_search(ds, counts, depth, batched=True, epsilon=0.0, budget=None, stats=None, roots=None,
+                        accepted=None, visited=None):
+    """DCs as (preds, pred, a1) results: the DC not(preds ^ pred) and its number of violating tuple pairs.
+
+    With epsilon > 0, approximate DCs are accepted too: those violated by less than a fraction epsilon of the tuple
+    pairs satisfying preds. Accepted predicate sets are not expanded, and neither are the sets containing one, reached
+    by another branch: candidates are visited by increasing probability (sortedPreds), so the rarest predicates, the
+    most likely to make a DC, are accepted first and cut the branches of the later ones. With a Budget, the search
+    stops when it is exhausted and returns the DCs found so far. With stats, the nodes visited and the candidates
+    tested are counted.
+
+    To continue a search one level deeper, roots are the predicate sets it visited at its depth, in visiting order, and
+    accepted the sets it accepted: only the new level is then searched, and none of its sets containing a DC of a lower
+    level is tested. The visited sets (a dict, in visiting order) and the accepted ones are added to visited and
+    accepted."""
+    # With LazyCounts, counts are computed the first time they are read. The bitset of the current predicate set is
+    # then kept on the DFS stack, so each candidate only costs one intersection with the evidence of the new predicate.
+    lazy = isinstance(counts, LazyCounts)
     DCResult = []
-    visited = set()
+    visited = {} if visited is None else visited
+    accepted = set() if accepted is None else accepted
+    tests = 0
 
+    # The batched test evaluates all the candidates of a node at once.
+    test = SignificanceTest() if batched else None
+    y1_function=y1()
+    y2_function=y2()
 
     # Recursive function like before, to explore in DFS the space of predicate sets up to a given depth.
-    def search(preds, cols):
+    def search(preds, cols, x):
+        nonlocal tests
         # Every candidate needs to be evaluated only once
-        if preds in visited:
+        if preds in visited or (budget is not None and budget.exceeded()):
             return
-        visited.add(preds)
+        visited[preds] = None
 
         # Like before, stop at maximum depth
         if len(preds) >= depth:
@@ -78,79 +180,171 @@ def discover_dcs(dataset_path, row_count=2048, depth=3):
         # A DC is only accepted when the inequalities are statistically significant
         # indicating there is some relationship among this particular set of predicates
         # that is not captured by any of its subsets
-        for pred in ds.sortedPreds:
-            # As before, we do not add predicates over already used columns to avoid trivial DCs.
-            ncol = ds.predCols[pred]
-            if ncol in cols:
-                continue
 
+        # As before, we do not add predicates over already used columns to avoid trivial DCs.
+        # Nor do we extend DCs already accepted.
+        candidates = [pred for pred in ds.sortedPreds if ds.predCols[pred] not in cols]
+        if accepted:
+            candidates = [pred for pred in candidates if not contains_accepted(preds | {pred}, accepted)]
+        if batched:
+            if lazy:
+                for pred in candidates:
+                    counts.prefetch(preds | {pred}, x, pred)
+            validity, a1s = test.evaluate(counts, preds, candidates)
+            tests += len(candidates)
+
+        for k, pred in enumerate(candidates):
+            if budget is not None and budget.exceeded():
+                break
             # Determine if the DC is valid
             npreds = preds | {pred}
-            ncols = cols | {ncol}
-
-            # a and b are number of successes and failures of a Bernouilli radnom variable
-            # In our case, the number of tuple pairs that fulfill pred when the others in preds are true.
-            # Ex: a1=|ABC|/|BC|, b1=|(!A)BC|/|BC|
-            a1 = int(counts[npreds])
-            b1 = int(counts[preds]) - a1
-
-            # Assume validity until some conditional of a subset is not significantly different from the current conditional
-            valid = True
-            for subPreds in powerset(preds):
-                # For every subset of preds, compare the conditionals
-                # Ex: compare p(A|BC) with p(A|B)
-                subPreds = frozenset(subPreds)
-                npreds2 = subPreds | {pred}
-
-                # Ex: a1=|AB|/|B|, b1=|(!A)B|/|B|
-                a2 = int(counts[npreds2])
-                b2 = int(counts[subPreds]) - a2
-
-                # If the population probability of p(A|BC) is u1 and the one of p(A|B) is u2,
-                # given our information a1,a2,b1,b2, we know the distribution of ln((a1*b2)/(b1*a2)) has mean:
-                u = y1_function(a1 + 1) - y1_function(b1 + 1) - y1_function(a2 + 1) + y1_function(b2 + 1)
-
-                # and standard deviation
-                s = np.sqrt(y2_function(a1 + 1) + y2_function(b1 + 1) + y2_function(a2 + 1) + y2_function(b2 + 1))
-
-                # If the mean is more than 2 standard deviations from 0, it statistically significant enough for us to claim
-                # the conditional p(A|BC) is smaller than p(A|B), and therefore there is some relationship
-                # Otherwise, there is not enough evidence and this difference in distribution could be due to randomness.
-                if u + 2 * s > 0:
-                    valid = False
-                    break
+            ncols = cols | {ds.predCols[pred]}
+            newx = None
+            # A DC accepted in the branch of an earlier candidate may be contained in this one
+            if accepted and contains_accepted(npreds, accepted):
+                continue
+
+            if batched:
+                valid, a1 = bool(validity[k]), a1s[k].item()
+                b1 = counts[preds] - a1
+                if lazy and valid and not meets_tolerance(a1, b1, epsilon):
+                    newx = intersect(x, ds.evi[pred])
+            else:
+                if lazy:
+                    newx = counts.extend(npreds, x, pred)
+
+                # a and b are number of successes and failures of a Bernouilli radnom variable
+                # In our case, the number of tuple pairs that fulfill pred when the others in preds are true.
+                # Ex: a1=|ABC|/|BC|, b1=|(!A)BC|/|BC|
+                a1 = counts[npreds]
+                b1 = counts[preds] - a1
+                tests += 1
+
+                # Assume validity until some conditional of a subset is not significantly different from the current conditional
+                valid = True
+                for subPreds in powerset(preds):
+                    # For every subset of preds, compare the conditionals
+                    # Ex: compare p(A|BC) with p(A|B)
+                    subPreds = frozenset(subPreds)
+                    npreds2 = subPreds | {pred}
+
+                    # Ex: a1=|AB|/|B|, b1=|(!A)B|/|B|
+                    a2 = counts[npreds2]
+                    b2 = counts[subPreds] - a2
+
+                    # If the population probability of p(A|BC) is u1 and the one of p(A|B) is u2,
+                    # given our information a1,a2,b1,b2, we know the distribution of ln((a1*b2)/(b1*a2)) has mean:
+                    u = y1_function(a1 + 1) - y1_function(b1 + 1) - y1_function(a2 + 1) + y1_function(b2 + 1)
+
+                    # and standard deviation
+                    s = np.sqrt(y2_function(a1 + 1) + y2_function(b1 + 1) + y2_function(a2 + 1) + y2_function(b2 + 1))
+
+                    # If the mean is more than 2 standard deviations from 0, it statistically significant enough for us to claim
+                    # the conditional p(A|BC) is smaller than p(A|B), and therefore there is some relationship
+                    # Otherwise, there is not enough evidence and this difference in distribution could be due to randomness.
+                    if u + 2 * s > 0:
+                        valid = False
+                        break
             if valid:
                 # If is valid, there is some significant relationship between the predicates
                 # However, we only accept a DC when it is a set of exclusive predicates.
-                # This means p(A|BC) must be 0.
-                # Optionally, approximate DCs may be discovered by changing this condition to:
-                # a1/(a1+b1)<0.01
-                # where 0.01 is a 1% approximation factor.
-                if a1 == 0:
-                    DCResult.append((preds, pred))
+                # This means p(A|BC) must be 0, or below epsilon for approximate DCs.
+                if meets_tolerance(a1, b1, epsilon):
+                    DCResult.append((preds, pred, a1))
+                    accepted.add(npreds)
                 else:
-                    search(npreds, ncols)
+                    search(npreds, ncols, newx)
 
-    y1_function=y1()
-    y2_function=y2()
+    # Begin search on the empty set of predicates, or on the roots
+    for preds in [frozenset()] if roots is None else roots:
+        x = None
+        if lazy:
+            x = ds.fullBits()
+            for pred in preds:
+                x = intersect(x, ds.evi[pred])
+        search(preds, frozenset(ds.predCols[pred] for pred in preds), x)
+    # The roots were counted by the search that visited them
+    add(stats, "significance_nodes", len(visited) - (0 if roots is None else len(roots)))
+    add(stats, "significance_tests", tests)
+    return DCResult
 
-    # Begin search on the empty set of predicates
-    search(frozenset(), frozenset())
 
-    DCResults = DCResult
+def export_dcs(ds, DCResults, reduce=True, ratios=False, stats=None):
+    """DCs of the results, printed. Duplicates are dropped, and with reduce the DCs implied by another one too. With
+    ratios, a dict of every DC to its violation ratio: the fraction of the tuple pairs violating it."""
+    dcs, seen, violations = [], set(), {}
+    for preds, pred, a1 in DCResults:
+        s = preds | {pred}
+        if s not in seen:
+            seen.add(s)
+            dcs.append(list(preds) + [pred])
+            violations[s] = a1
+    if reduce:
+        dcs = reduce_dcs(dcs, ds.preds)
+    add(stats, "dcs_found", len(DCResults))
+    add(stats, "dcs_distinct", len(seen))
+    add(stats, "dcs_reduced", len(dcs))
+    out = [DenialConstraint([ds.preds[p] for p in dc]).__repr__() for dc in dcs]
+    if ratios:
+        return {dc: violations[frozenset(preds)] / ds.eviSize for dc, preds in zip(out, dcs)}
+    return out
 
 
-    # Export the results
-    def getPred(i,ds): return (ds.preds[i])
+def discover_dcs(dataset_path, row_count=None, depth=3, evidence_mode="vectorized", cross_columns=False,
+                 sample_pairs=None, workers=1, counting="eager", cache_size=1 << 16, batched=True, evidence_store=None,
+                 dataset=None, reduce=True, epsilon=0.0, ratios=False, budget=None, stats=None, multiset=False,
+                 min_selectivity=None):
+    # A Dataset already built by load_dataset (with its evidence) can be given to skip loading. With a Stats, the
+    # phases of the run are timed and its counters recorded. With multiset, counting runs over the distinct evidences
+    # of the tuple pairs, weighted by their multiplicities. min_selectivity prunes the cross-column predicates (see
+    # load_dataset).
+    ds = dataset if dataset is not None else load_dataset(dataset_path, row_count, evidence_mode, cross_columns,
+                                                           sample_pairs, evidence_store, stats=stats,
+                                                           multiset=multiset, min_selectivity=min_selectivity,
+                                                           budget=budget)
 
+    # Counts of the predicate sets. "eager" counts every column-disjoint set up to depth before the significance
+    # phase; "lazy" only counts the ones the significance phase reads, memoized in an LRU of cache_size sets.
+    if counting not in ("eager", "lazy"):
+        raise ValueError(f"Unsupported counting mode: {counting}")
+    lazyCounts = LazyCounts(ds, cache_size) if counting == "lazy" else None
 
-    dcs=set({})
-    dcs_out = []
+    def counts(level, lowerCounts=None):
+        # Counts of the predicate sets up to level predicates, extending the ones of the lower levels
+        if lazyCounts is not None:
+            return lazyCounts
+        known = len(lowerCounts) if lowerCounts is not None else 0
+        with phase(stats, "counting"):
+            levelCounts = count_predicate_sets(ds, level, workers, budget, lowerCounts)
+        add(stats, "lattice_nodes", len(levelCounts) - known)
+        return levelCounts
 
-    for dc in [ DenialConstraint([ getPred(p,ds) for p in preds]+[getPred(pred,ds)]) for preds,pred in DCResults]:
-        s=frozenset(dc.preds)
-        if s not in dcs:
-            dcs.add(s)
-            dcs_out.append(dc.__repr__())
+    def search(levelCounts, level, roots=None, accepted=None, visited=None):
+        with phase(stats, "significance"):
+            return significance_search(ds, levelCounts, level, batched, epsilon, budget, stats, roots, accepted,
+                                       visited)
 
-    return dcs_out
\ No newline at end of file
+    if budget is None:
+        DCResults = search(counts(depth), depth)
+    else:
+        # Anytime search: one level deeper at a time, so that when the budget runs out the DCs of the lower levels are
+        # all found. The DCs found so far in the interrupted level are kept too (budget.exhausted flags the result).
+        # Each level only counts its own sets and tests its own DCs, the ones of the lower levels being kept.
+        # Sets containing a DC of a lower level are not tested, so the implied DCs a single search can find before
+        # the smaller one (and drops on reduce) are not found.
+        DCResults, levelCounts, roots, accepted = [], None, None, set()
+        for level in range(1, depth + 1):
+            levelCounts = counts(level, levelCounts)
+            if budget.exceeded():
+                break
+            visited = {}
+            DCResults += search(levelCounts, level, roots, accepted, visited)
+            if budget.exceeded():
+                break
+            # The next level starts from the sets expanded up to this one
+            roots = [preds for preds in visited if len(preds) == level]
+    if lazyCounts is not None:
+        # Sets counted on demand during the significance phase
+        add(stats, "lattice_nodes", lazyCounts.computed)
+    with phase(stats, "export"):
+        return export_dcs(ds, DCResults, reduce, ratios, stats)
@@ -41,29 +41,63 @@ class DenialConstraintSet:
                 self.DCs.append(preds)
 
     def buildGraph(self):
-        self.root = [{}, None]
-        for dc in self.DCs:
-            node = self.root
-            for pred in sorted(dc):
-                if pred not in node[0]:
-                    node[0][pred] = [{}, None]
-                node = node[0][pred]
-            node[1] = dc
+        self.root = dc_trie(self.DCs)
 
     def getReduced(self):
+        return reduce_dcs(self.DCs, self.dss.preds)
 
-        notImplied = [True] * len(self.DCs)
-
-        def impliesDC(dc1, dc2):
-            return all(
-                [any([self.dss.preds[pred].impliesPred(self.dss.preds[otherpred]) for otherpred in dc2]) for pred in
-                 dc1])
-
-        for i, dc1 in enumerate(self.DCs):
-            for j, dc2 in enumerate(self.DCs):
-                if impliesDC(dc1, dc2):
-                    if impliesDC(dc2, dc1):
-                        notImplied[j] = notImplied[j] and j <= i
-                    else:
-                        notImplied[j] = False
-        return [dc for i, dc in enumerate(self.DCs) if notImplied[i]]
\ No newline at end of file
+
+def dc_trie(dcs):
+    """Trie over the sorted predicates of the DCs. A node is [children, dc, ids]: the DC ending there (the last one, for
+    duplicates) and the indices of all the DCs ending there."""
+    root = [{}, None, []]
+    for i, dc in enumerate(dcs):
+        node = root
+        for pred in sorted(dc):
+            if pred not in node[0]:
+                node[0][pred] = [{}, None, []]
+            node = node[0][pred]
+        node[1] = dc
+        node[2].append(i)
+    return root
+
+
+def trie_subsets(root, allowed):
+    # Indices of the DCs whose predicates are all in allowed, following only the edges of allowed predicates
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield from node[2]
+        children = node[0]
+        if len(children) <= len(allowed):
+            stack.extend(child for pred, child in children.items() if pred in allowed)
+        else:
+            stack.extend(children[pred] for pred in allowed if pred in children)
+
+
+def implied_preds(preds):
+    # For every predicate index q, the indices of the predicates p with p.impliesPred(q) (same columns only)
+    byCols = {}
+    for p, pred in enumerate(preds):
+        byCols.setdefault((pred.l, pred.r), []).append(p)
+    return [frozenset(p for p in byCols[(pred.l, pred.r)] if preds[p].impliesPred(pred)) for pred in preds]
+
+
+def reduce_dcs(dcs, preds):
+    """DCs (lists of predicate indices) not implied by another DC; of equivalent DCs, the first one is kept.
+
+    dc1 implies dc2 when every predicate of dc1 is implied by one of dc2, i.e. when dc1 is a subset of the closure of
+    dc2 (the predicates implied by its predicates). So the implicants of a DC are the subsets of its closure, found by a
+    search of the trie of the DCs that only follows closure predicates, instead of checking every pair of DCs."""
+    implied = implied_preds(preds)
+    closures = [frozenset().union(*(implied[p] for p in dc)) for dc in dcs]
+    root = dc_trie(dcs)
+    keep = [True] * len(dcs)
+    for j, dc in enumerate(dcs):
+        for i in trie_subsets(root, closures[j]):
+            if all(p in closures[i] for p in dc):
+                keep[j] = keep[j] and j <= i
+            else:
+                keep[j] = False
+                break
+    return [dc for i, dc in enumerate(dcs) if keep[i]]
@@ -0,0 +1,241 @@
+# evidence.py
+
+import operator
+import numpy as np
+import pandas as pd
+
+# Number of tuple pairs compared per NumPy pass. Blocks always hold a multiple of 8 pairs so that
+# the packed blocks can be concatenated without re-packing.
+BLOCK_PAIRS = 1 << 22
+
+# Predicates satisfied by at most this fraction of the tuple pairs are stored sparse, as sorted pair indices: 32 or 64
+# bits per pair set instead of 1 bit per pair, but intersections cost time in proportion to the pairs set.
+SPARSE_DENSITY = 1 / 256
+
+
+def encode_values(values):
+    """Dictionary encoding of a column: the rank of each value among the sorted distinct values (its code), -1 for nulls,
+    and the sorted distinct values. Codes preserve the order of the values, so comparing codes compares values."""
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes.astype(np.int32), np.asarray(uniques)
+
+
+def joint_codes(lcodes, lvals, rcodes, rvals):
+    """Re-encode the codes of two columns over the union of their sorted distinct values, so that they can be compared."""
+    values = np.union1d(lvals, rvals)
+    lmap = np.append(np.searchsorted(values, lvals), -1)
+    rmap = np.append(np.searchsorted(values, rvals), -1)
+    return lmap[lcodes], rmap[rcodes]
+
+
+def row_blocks(n, block_pairs=BLOCK_PAIRS):
+    """Split the rows into blocks whose tuple pairs fill (at most) block_pairs bits, in multiples of 8 rows."""
+    rows = max(8, (block_pairs // max(n - 1, 1)) // 8 * 8)
+    for start in range(0, n, rows):
+        yield start, min(start + rows, n)
+
+
+def partners(start, end, n):
+    """Right tuple of every pair whose left tuple is in [start, end), in evidence order.
+
+    Row i is paired with i+1, ..., n-1 and then with 0, ..., i-1, which is (i + 1 + k) mod n for k in [0, n-1)."""
+    rows = np.arange(start, end)
+    return (rows[:, None] + 1 + np.arange(n - 1)[None, :]) % n
+
+
+def pair_blocks(n, pairs=None, block_pairs=BLOCK_PAIRS):
+    """Left and right tuples of the evidence pairs, block by block: all n*(n-1) ordered pairs in evidence order, or the
+    sampled (left, right) index arrays if given."""
+    if pairs is None:
+        for start, end in row_blocks(n, block_pairs):
+            yield np.arange(start, end)[:, None], partners(start, end, n)
+    else:
+        step = max(8, block_pairs // 8 * 8)
+        for start in range(0, len(pairs[0]), step):
+            yield pairs[0][start:start + step], pairs[1][start:start + step]
+
+
+def both_valid(left, right):
+    return (left >= 0) & (right >= 0)
+
+
+def compare(op, left, right, nulls):
+    """Evaluate op over pairs of codes with the null semantics of pandas: nulls only satisfy <>."""
+    res = op.func(left, right)
+    if nulls:
+        valid = both_valid(left, right)
+        res = res | ~valid if op.func is operator.ne else res & valid
+    return res
+
+
+def has_nulls(lcodes, rcodes):
+    return bool((lcodes < 0).any() or (rcodes < 0).any())
+
+
+def pack_pairs(lcodes, rcodes, funcs, pairs=None, block_pairs=BLOCK_PAIRS):
+    """Packed bitsets of func(t0, t1) for every func, over all n*(n-1) ordered tuple pairs or the given ones."""
+    blocks = [[] for _ in funcs]
+    for lrows, rrows in pair_blocks(len(lcodes), pairs, block_pairs):
+        left = lcodes[lrows]
+        right = rcodes[rrows]
+        for k, func in enumerate(funcs):
+            blocks[k].append(np.packbits(func(left, right), axis=None, bitorder='little'))
+    return [np.concatenate(b) if b else np.zeros(0, dtype=np.uint8) for b in blocks]
+
+
+def build_evidence(lcodes, rcodes, ops, pairs=None, block_pairs=BLOCK_PAIRS):
+    """Packed evidence bitsets of t0.l op t1.r for every op, over all n*(n-1) ordered tuple pairs or the given ones."""
+    nulls = has_nulls(lcodes, rcodes)
+    funcs = [lambda l, r, op=op: compare(op, l, r, nulls) for op in ops]
+    return pack_pairs(lcodes, rcodes, funcs, pairs, block_pairs)
+
+
+def popcount(x, segments=None):
+    """Number of tuple pairs set in a packed or sparse bitset. With sampled pairs, the reweighted count over the
+    segments, as a float: it is not rounded, so that it is 0 only when no sampled pair is set."""
+    if is_sparse(x):
+        if segments is None:
+            return len(x)
+        bounds = np.cumsum([0] + [pairs for pairs, _ in segments])
+        inSegment = np.diff(np.searchsorted(x, bounds))
+        return float(sum(scale * int(k) for (_, scale), k in zip(segments, inSegment)))
+    if segments is None:
+        return int(np.bitwise_count(x).sum())
+    total, start = 0.0, 0
+    for pairs, scale in segments:
+        total += scale * int(np.bitwise_count(x[start:start + pairs // 8]).sum())
+        start += pairs // 8
+    return total
+
+
+def is_sparse(x):
+    # Sparse bitsets are arrays of pair indices, packed ones arrays of bytes
+    return x.dtype != np.uint8
+
+
+def sparse_bits(bits, size, block_pairs=BLOCK_PAIRS):
+    """Sparse form of a packed bitset over size pairs: the sorted indices of the pairs set. Built a block of pairs at a
+    time, unpacking only the bytes with some pair set."""
+    dtype = np.int32 if size <= np.iinfo(np.int32).max else np.int64
+    step = max(1, block_pairs // 8)
+    blocks = [np.zeros(0, dtype=dtype)]
+    for start in range(0, len(bits), step):
+        block = bits[start:start + step]
+        nonzero = np.flatnonzero(block)
+        rows, offsets = np.nonzero(np.unpackbits(block[nonzero, None], axis=1, bitorder='little'))
+        blocks.append(((start + nonzero[rows]) * 8 + offsets).astype(dtype))
+    idx = np.concatenate(blocks)
+    return idx[:np.searchsorted(idx, size)]
+
+
+def intersect(x, bits):
+    """Pairs set in both bitsets, each packed or sparse. With a sparse one the result is sparse, and costs time in
+    proportion to its pairs: each of them is looked up in the other bitset."""
+    if not is_sparse(x) and not is_sparse(bits):
+        return np.bitwise_and(x, bits)
+    if is_sparse(x) and is_sparse(bits):
+        small, large = (x, bits) if len(x) <= len(bits) else (bits, x)
+        found = np.searchsorted(large, small)
+        return small[large[np.minimum(found, len(large) - 1)] == small] if len(large) else large
+    idx, packed = (x, bits) if is_sparse(x) else (bits, x)
+    return idx[(packed[idx >> 3] >> (idx & 7).astype(np.uint8)) & 1 == 1]
+
+
+def distinct_rows(vectors):
+    """Ids of the distinct rows of a 2D array, dense from 0, and one row index of each id. Rows are hashed a column at a
+    time, in O(rows) instead of sorting them."""
+    ids = np.zeros(len(vectors), dtype=np.int64)
+    for word in vectors.T:
+        codes, uniques = pd.factorize(word)
+        ids, _ = pd.factorize(ids * len(uniques) + codes)
+    rows = np.empty(int(ids.max(initial=-1)) + 1, dtype=np.int64)
+    rows[ids] = np.arange(len(ids))
+    return ids, rows
+
+
+def evidence_multiset(evi, size, segments=None, block_pairs=BLOCK_PAIRS, sample=None):
+    """Evidence multiset of packed bitsets over size pairs: the distinct sets of predicates satisfied by a tuple pair
+    (its evidence) and their multiplicities, the number of pairs with each (with sampled pairs, their reweighted
+    number). Returns the packed bitset of every predicate over the distinct evidences, and the multiplicities.
+    sample(), if given, is called after every block of pairs, while its buffers are allocated (see Stats.sample)."""
+    words = max(1, -(-len(evi) // 64))
+    scales = None
+    if segments is not None:
+        scales = np.repeat([scale for _, scale in segments], [pairs for pairs, _ in segments])
+    uniques, weights = [], []
+    step = max(8, block_pairs // 8 * 8)
+    for start in range(0, size, step):
+        end = min(start + step, size)
+        # Evidence of every pair of the block, as words of 64 predicates
+        vectors = np.zeros((end - start, words), dtype=np.uint64)
+        for p, bits in enumerate(evi):
+            satisfied = np.unpackbits(bits[start // 8:-(-end // 8)], count=end - start, bitorder='little')
+            vectors[:, p // 64] |= satisfied.astype(np.uint64) << np.uint64(p % 64)
+        ids, rows = distinct_rows(vectors)
+        if sample is not None:
+            sample()
+        uniques.append(vectors[rows])
+        weights.append(np.bincount(ids, None if scales is None else scales[start:end], len(rows)))
+
+    # Merge the evidences of the blocks
+    vectors = np.concatenate(uniques) if uniques else np.zeros((0, words), dtype=np.uint64)
+    ids, rows = distinct_rows(vectors)
+    weights = np.bincount(ids, np.concatenate(weights) if weights else None, len(rows))
+    if segments is None:
+        weights = weights.astype(np.int64)
+    vectors = vectors[rows]
+    bits = [np.packbits((vectors[:, p // 64] >> np.uint64(p % 64)) & np.uint64(1), bitorder='little')
+            for p in range(len(evi))]
+    return bits, weights
+
+
+def weighted_count(x, weights):
+    """Number of tuple pairs set in a bitset over the distinct evidences of a multiset: the sum of their
+    multiplicities (a float with the reweighted multiplicities of sampled pairs, see popcount)."""
+    if is_sparse(x):
+        return weights[x].sum().item()
+    return np.dot(np.unpackbits(x, count=len(weights), bitorder='little'), weights).item()
+
+
+def full_bits(size):
+    """Packed bitset with all size tuple pairs set."""
+    x = np.full((-(-size // 8),), 255, dtype=np.uint8)
+    if size % 8:
+        x[-1] = (1 << (size % 8)) - 1
+    return x
+
+
+def negate(bits, size, valid=None):
+    """Packed complement of bits over size pairs, restricted to the valid pairs if given."""
+    res = np.invert(bits)
+    if valid is not None:
+        np.bitwise_and(res, valid, out=res)
+    if size % 8:
+        res[-1] &= (1 << (size % 8)) - 1
+    return res
+
+
+def derive_evidence(lcodes, rcodes, ops, eq, gt, pairs=None, block_pairs=BLOCK_PAIRS):
+    """Same result as build_evidence, but only == and > are compared and the other operators are derived from them
+    with packed bitwise operations using the negation/implication tables of the operators."""
+    n = len(lcodes)
+    size = n * (n - 1) if pairs is None else len(pairs[0])
+    nulls = has_nulls(lcodes, rcodes)
+
+    base = [eq] + ([gt] if any(op != eq and op != eq.neg for op in ops) else [])
+    funcs = [lambda l, r, op=op: compare(op, l, r, nulls) for op in base] + ([both_valid] if nulls else [])
+    packed = pack_pairs(lcodes, rcodes, funcs, pairs, block_pairs)
+    bits = dict(zip(base, packed))
+    valid = packed[-1] if nulls else None
+
+    if gt in bits:
+        # The operator implied by both == and > (>=) is their union, as they never hold together.
+        for op in eq.imp:
+            if op in gt.imp:
+                bits[op] = np.bitwise_or(bits[eq], bits[gt])
+
+    # The rest are negations of the ones above. Nulls satisfy <> but none of the order operators.
+    for op in ops:
+        if op not in bits:
+            bits[op] = negate(bits[op.neg], size, None if op == eq.neg else valid)
+    return [bits[op] for op in ops]
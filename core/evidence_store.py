@@ -0,0 +1,92 @@
+# evidence_store.py
+
+import hashlib
+import json
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+# File layout: MAGIC, the offset of the header (8 bytes, little endian), the packed bitsets of every predicate one after
+# the other (DATA_OFFSET onwards) and the JSON header at the end, as it is only complete once the evidence is built.
+MAGIC = b"DQEVI001"
+DATA_OFFSET = 16
+
+
+def predicate_keys(preds):
+    return [[pred.l, repr(pred.op), pred.r] for pred in preds]
+
+
+def fingerprint(ds):
+    """Hash of the encoded columns of ds and of its sampled tuple pairs, if any."""
+    h = hashlib.sha1()
+    for col in ds.columns:
+        h.update(ds.codes[col].tobytes())
+        h.update(pd.util.hash_pandas_object(pd.Series(ds.vals[col]), index=False).to_numpy().tobytes())
+    if ds.pairs is not None:
+        h.update(ds.pairs[0].tobytes())
+        h.update(ds.pairs[1].tobytes())
+    return h.hexdigest()
+
+
+class EvidenceStore:
+    """Evidence bitsets of a Dataset in one contiguous memory-mapped file, so that they can be paged in and out by the OS
+    and reused across runs. The header records the predicate order, predProbs and the tuple pairs they cover."""
+
+    def __init__(self, path, preds, eviSize):
+        self.path = path
+        self.preds = preds
+        self.eviSize = eviSize
+        self.rowBytes = -(-eviSize // 8)
+        self.data = np.memmap(path, dtype=np.uint8, mode='w+', offset=DATA_OFFSET,
+                              shape=(max(len(preds), 1), max(self.rowBytes, 1)))
+
+    def put(self, p, bits):
+        # Writes the bitset of predicate p, returning its memory-mapped view
+        self.data[p, :len(bits)] = bits
+        return self.data[p, :self.rowBytes]
+
+    def close(self, ds):
+        self.data.flush()
+        header = {
+            "rows": len(ds),
+            "fingerprint": fingerprint(ds),
+            "eviSize": int(ds.eviSize),
+            "preds": predicate_keys(ds.preds),
+            "predProbs": [float(p) for p in ds.predProbs],
+            "sortedPreds": list(ds.sortedPreds),
+            "eviSegments": ds.eviSegments,
+        }
+        with open(self.path, "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(json.dumps(header).encode())
+            f.seek(0)
+            f.write(MAGIC + struct.pack("<Q", offset))
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        start = f.read(DATA_OFFSET)
+        if len(start) < DATA_OFFSET or start[:8] != MAGIC:
+            return None
+        f.seek(struct.unpack("<Q", start[8:])[0])
+        return json.loads(f.read())
+
+
+def open_store(path, ds):
+    """Memory-mapped evidence of ds from the store at path, as (evi, header). None if there is no store at path or it
+    was built for another table, predicate space or tuple pair sample."""
+    if not os.path.exists(path):
+        return None
+    header = read_header(path)
+    if header is None or header["preds"] != predicate_keys(ds.preds) or header["rows"] != len(ds):
+        return None
+    eviSize = len(ds.pairs[0]) if ds.pairs is not None else len(ds) * (len(ds) - 1)
+    if header["eviSize"] != eviSize or header["fingerprint"] != fingerprint(ds):
+        return None
+    rowBytes = -(-eviSize // 8)
+    data = np.memmap(path, dtype=np.uint8, mode='r', offset=DATA_OFFSET,
+                     shape=(max(len(ds.preds), 1), max(rowBytes, 1)))
+    return [data[p, :rowBytes] for p in range(len(ds.preds))], header
@@ -0,0 +1,115 @@
+# incremental.py
+
+import pickle
+
+import numpy as np
+
+from core.dataset import Dataset
+from core.dc_discovery import count_predicate_sets, export_dcs, load_dataset, significance_search
+from core.evidence import BLOCK_PAIRS, build_evidence, derive_evidence, full_bits, partners, popcount
+
+
+class PairBlock:
+    """Evidence of a block of tuple pairs, with the attributes of Dataset read by count_predicate_sets."""
+
+    def __init__(self, ds, evi, size):
+        self.evi = evi
+        self.eviSize = size
+        self.sortedPreds = ds.sortedPreds
+        self.predCols = ds.predCols
+
+    def count(self, x):
+        return popcount(x)
+
+    def fullBits(self):
+        return full_bits(self.eviSize)
+
+
+def new_pair_blocks(n, k, block_pairs=BLOCK_PAIRS):
+    """Tuple pairs of a table of n + k rows that involve one of its last k rows, block by block: every new row i with all
+    the other rows, (i, j), and every old row j with it, (j, i)."""
+    total = n + k
+    rows = max(1, block_pairs // (total - 1 + n))
+    for start in range(n, total, rows):
+        end = min(start + rows, total)
+        new = np.arange(start, end)
+        left = np.concatenate([np.repeat(new, total - 1), np.tile(np.arange(n), len(new))])
+        right = np.concatenate([partners(start, end, total).ravel(), np.repeat(new, n)])
+        yield left, right
+
+
+class IncrementalDiscovery:
+    """DCs of a table that grows by appended batches of rows.
+
+    Only the encoded rows, the predicates and the counts of every predicate set up to depth are kept between batches:
+    the evidence of the old tuple pairs is not needed again, as their counts do not change. append() builds the
+    evidence of the new x old and new x new pairs only, adds their counts and reruns the significance phase, in
+    O(k*n) for k new rows instead of O((n+k)^2). The predicates and column types are the ones of the first batch."""
+
+    def __init__(self, dataset_path, row_count=None, depth=3, evidence_mode="vectorized", cross_columns=False,
+                 batched=True, loader="pandas"):
+        self.depth = depth
+        self.evidenceMode = evidence_mode
+        self.batched = batched
+        self.loader = loader
+        self.ds = load_dataset(dataset_path, row_count, evidence_mode, cross_columns, loader=loader)
+        self.counts = count_predicate_sets(self.ds, depth)
+        self.dcs = export_dcs(self.ds, significance_search(self.ds, self.counts, depth, batched))
+        # The evidence is only needed for the counts
+        self.ds.evi = None
+
+    def pairCounts(self, n, k):
+        # Counts of every predicate set over the tuple pairs involving the last k of the n + k rows
+        ds = self.ds
+        groups = [(preds, ds.pairCodes(ds.preds[preds[0]].l, ds.preds[preds[0]].r), [ds.preds[p].op for p in preds])
+                  for preds in ds.colPreds]
+        delta = {}
+        for pairs in new_pair_blocks(n, k):
+            evi = [None] * len(ds.preds)
+            for preds, (lcodes, rcodes), ops in groups:
+                if self.evidenceMode == "derived":
+                    bits = derive_evidence(lcodes, rcodes, ops, ds.eq, ds.gt, pairs)
+                else:
+                    bits = build_evidence(lcodes, rcodes, ops, pairs)
+                for p, b in zip(preds, bits):
+                    evi[p] = b
+            for preds, count in count_predicate_sets(PairBlock(ds, evi, len(pairs[0])), self.depth).items():
+                delta[preds] = delta.get(preds, 0) + count
+        return delta
+
+    def append(self, batch_path, row_count=None):
+        """Adds the rows of a batch (all of them by default) and updates the DCs. Returns the DCs, and the ones added
+        and invalidated by the batch. The batch is read with the column types of the first one; a ValueError is raised,
+        before anything changes, if some value cannot be cast to them."""
+        ds = self.ds
+        if ds.pairs is not None:
+            raise ValueError("Incremental discovery needs the evidence of all the tuple pairs")
+        batch = Dataset(batch_path, loader=self.loader, types=ds.types, nrows=row_count, encoding='unicode_escape')
+        batch.buildPLIs()
+        batch.compact()
+        n, k = len(ds), len(batch)
+        ds.appendRows(batch)
+
+        for preds, count in self.pairCounts(n, k).items():
+            self.counts[preds] += count
+        ds.eviSize = len(ds) * (len(ds) - 1)
+        ds.predProbs = [self.counts[frozenset({p})] / ds.eviSize * 2 for p in range(len(ds.preds))]
+        ds.sortedPreds = sorted(range(len(ds.predProbs)), key=lambda i: ds.predProbs[i])
+
+        previous = self.dcs
+        self.dcs = export_dcs(ds, significance_search(ds, self.counts, self.depth, self.batched))
+        before, after = set(previous), set(self.dcs)
+        return {
+            "denial_constraints": self.dcs,
+            "added": [dc for dc in self.dcs if dc not in before],
+            "invalidated": [dc for dc in previous if dc not in after],
+        }
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
@@ -0,0 +1,106 @@
+# key_discovery.py
+
+import numpy as np
+import pandas as pd
+
+from core.dc_discovery import meets_tolerance
+from core.denialconstraints import DenialConstraint
+from core.operator_predicate import Predicate
+from core.stats import add, phase
+from core.validation import load_rows
+
+
+def stripped_partition(codes, sizes):
+    """Stripped partition of a column: the rows of its PLI clusters of two or more rows, and the cluster of each row.
+    Nulls equal no value, not even another null, so their rows are left out like singletons."""
+    rows = np.flatnonzero(codes >= 0)
+    rows = rows[sizes[codes[rows]] >= 2].astype(np.int32)
+    return rows, codes[rows]
+
+
+def violating_pairs(sizes):
+    # Ordered tuple pairs agreeing on all the columns of the partition, i.e. violating its key
+    sizes = sizes.astype(np.int64)
+    return int((sizes * (sizes - 1)).sum())
+
+
+def refine(rows, clusters, codes):
+    """Product of a stripped partition with a column, in O(rows): the rows of each cluster are split by their code, and
+    the clusters left with a single row are stripped. Returns the new partition and its violating pairs."""
+    col = codes[rows]
+    keep = col >= 0
+    rows, col = rows[keep], col[keep]
+    width = int(codes.max(initial=0)) + 1
+    keys = clusters[keep].astype(np.int64) * width + col
+    if (int(clusters.max(initial=0)) + 1) * width <= 4 * len(keys):
+        # Few possible keys: count them directly instead of hashing
+        ids = keys
+    else:
+        ids, _ = pd.factorize(keys)
+    sizes = np.bincount(ids)
+    keep = sizes[ids] >= 2
+    # Dense ids of the clusters kept
+    remap = np.cumsum(sizes >= 2) - 1
+    return rows[keep], remap[ids[keep]].astype(np.int32), violating_pairs(sizes[sizes >= 2])
+
+
+def minimal_keys(ds, depth=2, epsilon=0.0, budget=None, stats=None):
+    """Minimal (approximate) unique column combinations of up to depth columns (None for no limit), levelwise: the
+    combinations of a level are the ones whose subsets are all non-keys, and their partitions are products of the
+    partition of a non-key of the previous level with a column.
+
+    A combination is a key when no two rows agree on all its columns, or an approximate key when fewer than a fraction
+    epsilon of the tuple pairs do. Returns (columns, violating pairs) for every key. With a Budget, the search stops
+    when it is exhausted, with the keys of the lower levels all found."""
+    n = len(ds)
+    pairs = n * (n - 1)
+    columns = list(ds.columns)
+    keys = []
+    level = {}
+    for i, col in enumerate(columns):
+        rows, clusters = stripped_partition(ds.codes[col], ds.PLILen[col])
+        violations = violating_pairs(ds.PLILen[col])
+        if meets_tolerance(violations, pairs - violations, epsilon):
+            keys.append(((col,), violations))
+        else:
+            level[(i,)] = (rows, clusters)
+
+    size = 1
+    while level and (depth is None or size < depth):
+        expand = depth is None or size + 1 < depth
+        nextLevel = {}
+        for combo, (rows, clusters) in level.items():
+            for j in range(combo[-1] + 1, len(columns)):
+                if budget is not None and budget.exceeded():
+                    return keys
+                candidate = combo + (j,)
+                # Apriori: a combination containing a key (or a combination not generated) is not minimal
+                if any(candidate[:k] + candidate[k + 1:] not in level for k in range(len(combo))):
+                    continue
+                nrows, nclusters, violations = refine(rows, clusters, ds.codes[columns[j]])
+                add(stats, "lattice_nodes")
+                if meets_tolerance(violations, pairs - violations, epsilon):
+                    keys.append((tuple(columns[k] for k in candidate), violations))
+                elif expand:
+                    nextLevel[candidate] = (nrows, nclusters)
+        level = nextLevel
+        size += 1
+    return keys
+
+
+def discover_keys(dataset_path, row_count=None, depth=2, epsilon=0.0, ratios=False, dataset=None, loader="pandas",
+                  budget=None, stats=None):
+    """Unique constraints ¬(t0.A == t1.A ^ ...) of the minimal (approximate) keys of all the rows of a file (or the
+    first row_count), found from the PLIs of the columns without any pairwise evidence. A Dataset with PLIs (see
+    validation.load_rows) can be given instead. With ratios, a dict of every DC to its violation ratio."""
+    ds = dataset if dataset is not None else load_rows(dataset_path, loader, row_count, stats)
+
+    pairs = max(len(ds) * (len(ds) - 1), 1)
+    eq = ds.opmap["=="]
+    dcs = {}
+    with phase(stats, "keys"):
+        keys = minimal_keys(ds, depth, epsilon, budget, stats)
+    add(stats, "dcs_found", len(keys))
+    for cols, violations in keys:
+        dcs[DenialConstraint([Predicate(col, eq, col) for col in cols]).__repr__()] = violations / pairs
+    return dcs if ratios else list(dcs)
@@ -0,0 +1,197 @@
+# loaders.py
+import csv
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+# Types of the Name(Type) column annotations of CSV headers, and how the Arrow reader parses them
+HEADER_PATTERN = re.compile(r'([^\(\)]*)(?:\(| )([^\(\)]*)\)?')
+HEADER_TYPES = {'String': str, 'Integer': float, 'Int': float, 'Double': float, 'int': float, 'str': str,
+                'float': float}
+ARROW_TYPES = {str: pa.string(), float: pa.float64()}
+
+# Bytes per CSV block; when reading the first rows only, about CSV_ROW_BYTES per row (the first block is always read)
+CSV_BLOCK_SIZE = 1 << 20
+CSV_ROW_BYTES = 64
+
+
+def select_columns(names, columns=None, exclude=None):
+    # Columns of the file kept by the include (columns) and exclude lists, in file order
+    return [name for name in names
+            if (columns is None or name in columns) and (exclude is None or name not in exclude)]
+
+
+def parse_header(columns):
+    """Name and type of every column from its Name(Type) annotation. Columns without a known annotation keep their full
+    name and a None type, to be inferred by the reader."""
+    names, types = [], {}
+    for col in columns:
+        match = HEADER_PATTERN.match(col)
+        if match is not None and match[2] in HEADER_TYPES:
+            names.append(match[1])
+            types[col] = HEADER_TYPES[match[2]]
+        else:
+            names.append(col)
+            types[col] = None
+    return names, types
+
+
+def infer_series_type(s):
+    # Numbers or dates stored as strings. Vectorized: the integer check is done on the whole column at once.
+    numeric = pd.to_numeric(s, errors="coerce")
+    valid = numeric.dropna()
+    if len(valid) > 0:
+        if np.all(np.floor(valid.to_numpy(dtype=float)) == valid.to_numpy(dtype=float)):
+            return numeric.astype("Int64")
+        else:
+            return numeric.astype("Float64")
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        datetime = pd.to_datetime(s, errors="coerce")
+    if datetime.notna().sum() > 0 and datetime.notna().sum() >= len(s) * 0.5:
+        return datetime
+
+    return s
+
+
+def cast_series(s, pytype, name):
+    """Column cast to the Python type of the same column in a previous load (see map_dtype_to_pytype), keeping nulls.
+    Raises ValueError if some value cannot be cast."""
+    try:
+        if pytype is str:
+            return s.where(s.isna(), s.astype(str))
+        if pytype in (int, float):
+            numeric = pd.to_numeric(s, errors="raise")
+            if pytype is int and not numeric.isna().any() and np.all(np.floor(numeric) == numeric):
+                return numeric.astype(np.int64)
+            return numeric.astype(float)
+        if pytype is pd.Timestamp:
+            return pd.to_datetime(s, errors="raise")
+        if pytype is bool and not pd.api.types.is_bool_dtype(s.dtype):
+            raise ValueError(f"not booleans: {s.dtype}")
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Column {name} cannot be cast to {pytype.__name__}: {e}") from e
+    return s
+
+
+def arrow_column_to_pandas(column):
+    # Column typed from the Arrow schema; only strings are inferred
+    t = column.type
+    if pa.types.is_dictionary(t):
+        column, t = column.cast(t.value_type), t.value_type
+    if pa.types.is_integer(t):
+        return column.to_pandas().astype("Int64")
+    if pa.types.is_floating(t) or pa.types.is_decimal(t):
+        return column.cast(pa.float64()).to_pandas().astype("Float64")
+    if pa.types.is_string(t) or pa.types.is_large_string(t):
+        return infer_series_type(column.to_pandas())
+    return column.to_pandas()
+
+
+def map_dtype_to_pytype(dtype):
+    if pd.api.types.is_string_dtype(dtype):
+        return str
+    elif pd.api.types.is_integer_dtype(dtype):
+        return int
+    elif pd.api.types.is_float_dtype(dtype):
+        return float
+    elif pd.api.types.is_bool_dtype(dtype):
+        return bool
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
+        return pd.Timestamp
+    else:
+        return object
+
+
+def parquet_row_groups(pf, nrows=None, sample=False, seed=0):
+    """Row groups to read for nrows rows: the first ones, or with sample ones picked at random across the file."""
+    order = np.arange(pf.num_row_groups)
+    if nrows is None:
+        return list(order)
+    if sample:
+        order = np.random.default_rng(seed).permutation(order)
+    groups, total = [], 0
+    for i in order:
+        if total >= nrows:
+            break
+        groups.append(int(i))
+        total += pf.metadata.row_group(int(i)).num_rows
+    return sorted(groups)
+
+
+def read_parquet(file, nrows=None, columns=None, exclude=None, sample=False, seed=0):
+    """DataFrame with the first nrows rows of a Parquet file, or with sample nrows rows drawn from row groups picked at
+    random. Only the footer and the column chunks of the selected columns in the needed row groups are read."""
+    pf = pq.ParquetFile(file)
+    names = select_columns(pf.schema_arrow.names, columns, exclude)
+    table = pf.read_row_groups(parquet_row_groups(pf, nrows, sample, seed), columns=names)
+    if nrows is not None and table.num_rows > nrows:
+        if sample:
+            rows = np.sort(np.random.default_rng(seed).choice(table.num_rows, nrows, replace=False))
+            table = table.take(rows)
+        else:
+            table = table.slice(0, nrows)
+    return pd.DataFrame({name: arrow_column_to_pandas(table.column(name)) for name in names})
+
+
+def csv_header(file):
+    # Column names from the first line of a CSV path or seekable binary file, which is rewound
+    if hasattr(file, "readline"):
+        line = file.readline()
+        file.seek(0)
+    else:
+        with open(file, "rb") as f:
+            line = f.readline()
+    return next(csv.reader([line.decode("utf-8-sig")]), [])
+
+
+def sample_batches(batches, nrows, seed=0):
+    # Uniform sample of nrows rows over a stream of record batches, in file order, keeping at most nrows rows plus one
+    # batch in memory: every row gets a random key and the rows with the nrows smallest keys are kept.
+    rng = np.random.default_rng(seed)
+    kept, keys = None, np.empty(0)
+    for batch in batches:
+        table = pa.Table.from_batches([batch])
+        if kept is not None:
+            table = pa.concat_tables([kept, table])
+        keys = np.concatenate([keys, rng.random(batch.num_rows)])
+        if len(keys) > nrows:
+            rows = np.sort(np.argpartition(keys, nrows)[:nrows])
+            table, keys = table.take(rows), keys[rows]
+        kept = table
+    return kept
+
+
+def read_csv_arrow(file, nrows=None, columns=None, exclude=None, sample=False, seed=0, block_size=None):
+    """DataFrame with the first nrows rows of a UTF-8 CSV file, or with sample nrows rows drawn uniformly from it, read
+    in blocks with pyarrow. Annotated columns get the type of their Name(Type) header, the others are inferred by
+    Arrow. Reading stops as soon as nrows rows are read, unless sampling."""
+    selected = select_columns(csv_header(file), columns, exclude)
+    _, types = parse_header(selected)
+    convert = pacsv.ConvertOptions(column_types={col: ARROW_TYPES[t] for col, t in types.items() if t is not None},
+                                   include_columns=selected, strings_can_be_null=True)
+    if block_size is None:
+        block_size = CSV_BLOCK_SIZE if nrows is None or sample else min(CSV_BLOCK_SIZE, max(nrows * CSV_ROW_BYTES, 1 << 16))
+    reader = pacsv.open_csv(file, read_options=pacsv.ReadOptions(block_size=block_size), convert_options=convert)
+
+    if sample and nrows is not None:
+        table = sample_batches(reader, nrows, seed)
+    else:
+        batches, rows = [], 0
+        for batch in reader:
+            batches.append(batch)
+            rows += batch.num_rows
+            if nrows is not None and rows >= nrows:
+                break
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+        if nrows is not None:
+            table = table.slice(0, nrows)
+    if table is None:
+        table = reader.schema.empty_table()
+    return table.to_pandas()
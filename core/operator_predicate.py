@@ -33,33 +33,35 @@ class Operator:
         hash_value = hash(fields)
         return hash_value
 
+# Expected proportion of tuple pairs satisfying t0.A op t1.B, given the frequencies l of A and r of B aligned over the
+# same sorted values. For a predicate over a single column, r is l.
 def eqExp(l, r):
-    n = sum(l)**2
-    return np.sum(l**2) / n
+    n = sum(l) * sum(r)
+    return np.sum(l * r) / n
 
 def neExp(l, r):
-    n = sum(l)
-    return 1 - np.sum(l**2) / n**2
+    n = sum(l) * sum(r)
+    return 1 - np.sum(l * r) / n
 
 def geExp(l, r):
-    n = sum(l)
-    cumFreq = np.cumsum(l)
-    return np.sum(l * (cumFreq)) / n**2
+    n = sum(l) * sum(r)
+    cumFreq = np.cumsum(r)
+    return np.sum(l * (cumFreq)) / n
 
 def leExp(l, r):
-    n = sum(l)
-    cumFreq = np.cumsum(l)
-    return np.sum(l * (n - cumFreq + l)) / n**2
+    n = sum(l) * sum(r)
+    cumFreq = np.cumsum(r)
+    return np.sum(l * (sum(r) - cumFreq + r)) / n
 
 def gtExp(l, r):
-    n = sum(l)
-    cumFreq = np.cumsum(l)
-    return np.sum(l * (cumFreq - l)) / n**2
+    n = sum(l) * sum(r)
+    cumFreq = np.cumsum(r)
+    return np.sum(l * (cumFreq - r)) / n
 
 def ltExp(l, r):
-    n = sum(l)
-    cumFreq = np.cumsum(l)
-    return np.sum(l * (n - cumFreq)) / n**2
+    n = sum(l) * sum(r)
+    cumFreq = np.cumsum(r)
+    return np.sum(l * (sum(r) - cumFreq)) / n
 
 
 # Operator initializations
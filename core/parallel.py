@@ -0,0 +1,102 @@
+# parallel.py
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from core.evidence import full_bits, intersect, popcount, weighted_count
+from core.evidence_store import DATA_OFFSET
+
+# Evidence and search parameters of a worker process, set by init_worker.
+_worker = {}
+
+
+def share_evidence(evi):
+    """Copy the evidence bitsets, packed or sparse, into one shared memory block. Returns the block and the (offset,
+    bytes, dtype) of each. Offsets are aligned to 8 bytes, so that sparse bitsets can be viewed as pair indices."""
+    layout, offset = [], 0
+    for bits in evi:
+        layout.append((offset, bits.nbytes, bits.dtype.str))
+        offset += -(-bits.nbytes // 8) * 8
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    buf = np.ndarray((offset,), dtype=np.uint8, buffer=shm.buf)
+    for bits, (start, length, _) in zip(evi, layout):
+        buf[start:start + length] = bits.view(np.uint8)
+    return shm, layout
+
+
+def init_worker(name, layout, store, size, segments, weights, sortedPreds, predCols, depth, known=-1):
+    if store is not None:
+        # Evidence backed by an evidence store: map the same file
+        buf = np.memmap(store, dtype=np.uint8, mode='r')
+        shm = None
+    else:
+        # Pool workers share the resource tracker of the parent, which owns and unlinks the block.
+        shm = shared_memory.SharedMemory(name=name)
+        buf = np.ndarray((shm.size,), dtype=np.uint8, buffer=shm.buf)
+    _worker.update(shm=shm, evi=[buf[start:start + length].view(dtype) for start, length, dtype in layout], size=size,
+                   segments=segments, weights=weights, sortedPreds=sortedPreds, predCols=predCols, depth=depth,
+                   known=known)
+
+
+def count_branch(k):
+    """Counts of every column-disjoint predicate set, up to depth predicates, whose first predicate in sortedPreds
+    order is sortedPreds[k]. Predicates are only added in sortedPreds order, so every set is counted in exactly one
+    branch. The sets of at most known predicates, already counted, are only traversed."""
+    evi, segments, weights, depth = _worker["evi"], _worker["segments"], _worker["weights"], _worker["depth"]
+    known = _worker["known"]
+    sortedPreds, predCols = _worker["sortedPreds"], _worker["predCols"]
+    counts = {}
+
+    def search(preds, cols, x, last):
+        if len(preds) > known:
+            counts[preds] = popcount(x, segments) if weights is None else weighted_count(x, weights)
+        if len(preds) >= depth:
+            return
+        for rank in range(last + 1, len(sortedPreds)):
+            pred = sortedPreds[rank]
+            ncol = predCols[pred]
+            if ncol in cols:
+                continue
+            search(preds | {pred}, cols | {ncol}, intersect(x, evi[pred]), rank)
+
+    pred = sortedPreds[k]
+    search(frozenset({pred}), frozenset({predCols[pred]}), intersect(full_bits(_worker["size"]), evi[pred]), k)
+    return counts
+
+
+def parallel_counts(ds, depth, workers, budget=None, counts=None, known=-1):
+    """Counts of every column-disjoint predicate set up to depth predicates, with the first-predicate branches of the
+    lattice split across a process pool. The evidence is shared with the workers through shared memory. The result is
+    the same as the serial search, as each set is counted once and branches are merged in sortedPreds order. Evidence
+    from an evidence store is mapped by the workers from the same file instead. With a Budget, the branches not
+    started when it is exhausted are cancelled. An evidence multiset is shared with its multiplicities. With counts, the
+    counts of the sets of at most known predicates, the deeper sets are added to them."""
+    counts = {} if counts is None else counts
+    if known < 0:
+        counts[frozenset()] = ds.count(ds.fullBits())
+    # Bits of the bitsets: tuple pairs, or the distinct evidences of a multiset
+    size = ds.eviSize if ds.eviWeights is None else len(ds.eviWeights)
+    if depth <= known or depth < 1:
+        return counts
+    if ds.eviStore is not None:
+        shm = None
+        rowBytes = -(-ds.eviSize // 8)
+        layout = [(DATA_OFFSET + p * rowBytes, rowBytes, "|u1") for p in range(len(ds.evi))]
+    else:
+        shm, layout = share_evidence(ds.evi)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(shm and shm.name, layout, ds.eviStore, size, ds.eviSegments, ds.eviWeights,
+                                           ds.sortedPreds, ds.predCols, depth, known)) as pool:
+            for branch in pool.map(count_branch, range(len(ds.sortedPreds))):
+                counts.update(branch)
+                if budget is not None and budget.exceeded():
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    break
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+    return counts
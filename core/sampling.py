@@ -0,0 +1,104 @@
+# sampling.py
+
+import numpy as np
+
+# Tuple pairs drawn per vectorized sampling round.
+BATCH = 1 << 16
+
+
+def cluster_rows(codes, sizes):
+    """Rows of the table sorted by their code, and the offset of every PLI cluster in that order."""
+    order = np.argsort(codes, kind='stable')
+    starts = int((codes < 0).sum()) + np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    return order, starts
+
+
+def stratified_pairs(codes, sizes, budget, eqShare=0.5, maxEqProb=0.5, seed=0):
+    """Sample a budget of ordered tuple pairs (i, j), i != j, from a table with n rows.
+
+    codes holds the integer codes of every column and sizes the sizes of its PLI clusters. The stratification columns
+    (columns whose equal pairs are at most maxEqProb of all pairs) are ordered by their number of equal pairs, and each
+    one has a stratum: the pairs that agree on it and on no previous column. The rest of the pairs is the last stratum.
+    The column strata share eqShare of the budget in proportion to the square root of their equal pairs (at least 8
+    pairs each), so the rare equal-value pairs of high-cardinality columns are kept, and are drawn through the PLIs; the
+    rest is drawn uniformly. All are drawn with replacement.
+
+    Returns the (left, right) arrays, stratum after stratum, and the segments [(pairs, scale)] such that
+    sum(scale * pairs satisfying P) is an unbiased estimate of the number of sampled pairs that would satisfy P under
+    uniform sampling. Returns None if the budget covers all the tuple pairs."""
+    rng = np.random.default_rng(seed)
+    n = len(codes[0])
+    total = n * (n - 1)
+    if budget >= total:
+        return None
+
+    strata = []
+    for c, s in zip(codes, sizes):
+        s = np.asarray(s, dtype=np.int64)
+        w = s * (s - 1)
+        if 0 < w.sum() <= maxEqProb * total:
+            strata.append((c, s, w) + cluster_rows(c, s))
+    strata.sort(key=lambda stratum: stratum[2].sum())
+    strat = np.stack([c for c, *_ in strata]) if strata else np.zeros((0, n), dtype=np.int64)
+
+    def agreeing(i, j, cols):
+        # Whether each pair agrees on some of the first cols stratification columns
+        return ((strat[:cols, i] == strat[:cols, j]) & (strat[:cols, i] >= 0)).any(axis=0)
+
+    colW = np.array([w.sum() for *_, w, _, _ in strata], dtype=float)
+    shares = np.sqrt(colW) / np.sqrt(colW).sum() if strata else colW
+    mEq = np.minimum(shares * min(budget * eqShare, colW.sum()), colW)
+    mEq = np.maximum(np.ceil(mEq / 8) * 8, 8).astype(np.int64)
+    mRest = max(budget - int(mEq.sum()), 0) // 8 * 8
+
+    # Pairs of stratum k: pick a cluster of column k by its number of pairs and two distinct rows in it, and keep the
+    # pairs that agree on no previous column. The acceptance rate estimates the size of the stratum.
+    def equalBatch(k):
+        c, s, w, order, starts = strata[k]
+        v = rng.choice(len(s), BATCH, p=w / w.sum())
+        a = rng.integers(0, s[v])
+        b = (a + 1 + rng.integers(0, s[v] - 1)) % s[v]
+        i, j = order[starts[v] + a], order[starts[v] + b]
+        keep = ~agreeing(i, j, k)
+        return i[keep], j[keep]
+
+    # Remaining pairs: uniform pairs that agree on no stratification column.
+    def restBatch():
+        i = rng.integers(0, n, BATCH)
+        j = (i + 1 + rng.integers(0, n - 1, BATCH)) % n
+        keep = ~agreeing(i, j, len(strata))
+        return i[keep], j[keep]
+
+    # Each sampled pair stands for (stratum size / stratum sample size) pairs of the table, rescaled to the sample size
+    left, right, sampled = [], [], []
+    for k in range(len(strata)):
+        eqLeft, eqRight, rounds = draw(lambda: equalBatch(k), mEq[k])
+        m = int(min(mEq[k], len(eqLeft))) // 8 * 8
+        if m:
+            left.append(eqLeft[:m])
+            right.append(eqRight[:m])
+            sampled.append((m, colW[k] * len(eqLeft) / (rounds * BATCH)))
+    restLeft, restRight, _ = draw(restBatch, mRest)
+    m = min(mRest, len(restLeft)) // 8 * 8
+    if m:
+        left.append(restLeft[:m])
+        right.append(restRight[:m])
+        sampled.append((m, total - sum(pairs for _, pairs in sampled)))
+    size = sum(m for m, _ in sampled)
+    segments = [(m, float(pairs / m * size / total)) for m, pairs in sampled]
+    empty = np.zeros(0, dtype=np.int64)
+    return (np.concatenate(left or [empty]), np.concatenate(right or [empty])), segments
+
+
+def draw(batch, m, maxRounds=10000, emptyRounds=16):
+    """Draw batches until m pairs are collected. Gives up after maxRounds, or after emptyRounds without any pair, e.g.
+    when the stratum is empty."""
+    left, right = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    got = rounds = 0
+    while got < m and rounds < maxRounds and (got or rounds < emptyRounds):
+        i, j = batch()
+        left.append(i)
+        right.append(j)
+        got += len(i)
+        rounds += 1
+    return np.concatenate(left), np.concatenate(right), rounds
@@ -0,0 +1,40 @@
+# significance.py
+
+import itertools
+
+import numpy as np
+
+from core.utils import digamma, trigamma
+
+
+class SignificanceTest:
+    """Vectorized log-odds test of significance_search, with the same digamma (utils.y1) and trigamma (utils.y2) values
+    as the test of a single candidate."""
+
+    def fails(self, a1, b1, a2, b2):
+        # True where p(A|BC) is not significantly smaller than p(A|B), see significance_search
+        x = np.stack(np.broadcast_arrays(a1, b1, a2, b2)) + 1
+        y1, y2 = digamma(x), trigamma(x)
+        u = y1[0] - y1[1] - y1[2] + y1[3]
+        s = np.sqrt(y2[0] + y2[1] + y2[2] + y2[3])
+        return u + 2 * s > 0
+
+    def evaluate(self, counts, preds, candidates):
+        """Validity and a1 of every candidate predicate added to preds.
+
+        All the candidates are tested against the subsets of preds of one size at a time, in the order of powerset, and
+        a candidate stops being tested (and its counts read) after its first failed subset."""
+        a1 = np.array([counts[preds | {pred}] for pred in candidates])
+        b1 = counts[preds] - a1
+        alive = np.arange(len(candidates))
+        for r in range(len(preds)):
+            if not len(alive):
+                break
+            subsets = [frozenset(sub) for sub in itertools.combinations(preds, r)]
+            a2 = np.array([[counts[sub | {candidates[c]}] for sub in subsets] for c in alive])
+            b2 = np.array([counts[sub] for sub in subsets])[None, :] - a2
+            failed = self.fails(a1[alive, None], b1[alive, None], a2, b2).any(axis=1)
+            alive = alive[~failed]
+        valid = np.zeros(len(candidates), dtype=bool)
+        valid[alive] = True
+        return valid, a1
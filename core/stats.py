@@ -0,0 +1,67 @@
+# stats.py
+
+import resource
+import time
+from contextlib import contextmanager, nullcontext
+
+from core.budget import MEMORY_CHECK_EVERY, resident_bytes
+
+
+class Stats:
+    """Instrumentation of a discovery run: the wall time of every phase and the resident memory at its end, and
+    counters (lattice nodes, significance tests, DCs, ...). Phases and counters repeated, like the levels of an anytime
+    search, add up. The peak memory of the run is the highest growth of the resident memory over its level when the
+    Stats was created, sampled at the start and end of the phases, every MEMORY_CHECK_EVERY counter updates and by the
+    evidence builds as they go (see sample)."""
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self.baseline = resident_bytes()
+        self.peak = 0
+        self.updates = 0
+
+    def sample(self):
+        # Resident memory now, recorded in the peak of the run
+        rss = resident_bytes()
+        self.peak = max(self.peak, rss - self.baseline)
+        return rss
+
+    @contextmanager
+    def phase(self, name):
+        self.sample()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(name, {"seconds": 0.0, "rss_bytes": 0})
+            entry["seconds"] += time.perf_counter() - start
+            entry["rss_bytes"] = max(entry["rss_bytes"], self.sample())
+
+    def add(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+        self.updates += 1
+        if self.updates % MEMORY_CHECK_EVERY == 1:
+            self.sample()
+
+    def asdict(self):
+        # Peak memory growth of the run, and peak resident memory of the whole process since it started (Linux reports
+        # it in KB)
+        return {"phases": self.phases, "peak_rss_growth_bytes": self.peak,
+                "process_peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, **self.counters}
+
+
+def phase(stats, name):
+    # Times a phase in stats, if any
+    return stats.phase(name) if stats is not None else nullcontext()
+
+
+def add(stats, name, value=1):
+    if stats is not None:
+        stats.add(name, value)
+
+
+def sample_memory(stats):
+    # Samples the resident memory in stats, if any, inside a phase with large transient allocations
+    if stats is not None:
+        stats.sample()
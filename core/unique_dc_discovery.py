@@ -1,22 +1,35 @@
-from core.dataset import Dataset
+from core.dc_discovery import contains_accepted, load_dataset, meets_tolerance
 from core.utils import powerset, y1, y2
 import numpy as np
 from core.denialconstraints import DenialConstraint
+from core.evidence import intersect
+from core.stats import add, phase
 
-def discover_unique_constraints(dataset_path, row_count=2048, depth=2):
-    # Load dataset
-    ds = Dataset(dataset_path, nrows=row_count, encoding='unicode_escape')
-
-    # Build index structures
-    ds.buildPLIs()
-    ds.buildPreds()
-    ds.buildEvi()
+def discover_unique_constraints(dataset_path, row_count=None, depth=2, evidence_mode="vectorized", sample_pairs=None,
+                                evidence_store=None, dataset=None, epsilon=0.0, ratios=False, budget=None, stats=None,
+                                multiset=False):
+    # With epsilon, approximate constraints violated by less than a fraction epsilon of the tuple pairs agreeing on the
+    # other columns are found too (see significance_search). With ratios, a dict of every DC to its violation ratio.
+    # With a Budget, levels are searched one at a time and the search stops when it is exhausted (see discover_dcs).
+    # With a Stats, the phases of the run are timed and its counters recorded. With multiset, counting runs over the
+    # distinct evidences of the tuple pairs (see load_dataset).
+    # Load dataset and build index structures, unless a Dataset built by load_dataset is given
+    ds = dataset if dataset is not None else load_dataset(dataset_path, row_count, evidence_mode,
+                                                           sample_pairs=sample_pairs, evidence_store=evidence_store,
+                                                           stats=stats, multiset=multiset, budget=budget)
 
     counts = {}
+    # Sets reached by the count search of the current level. The counts of the lower levels are kept, so only the sets
+    # of the new level are counted.
+    reached = set()
 
-    def count_pred_sets(preds, cols, x):
-        counts[preds] = np.bitwise_count(x).sum()
-        if len(preds) >= depth:
+    def count_pred_sets(preds, cols, x, level):
+        if budget is not None and budget.exceeded():
+            return
+        reached.add(preds)
+        if preds not in counts:
+            counts[preds] = ds.count(x)
+        if len(preds) >= level:
             return
         for pred in ds.sortedPreds:
             ncol = ds.predCols[pred]
@@ -24,63 +37,87 @@ def discover_unique_constraints(dataset_path, row_count=2048, depth=2):
                 continue
             npreds = preds | {pred}
             ncols = cols | {ncol}
-            if npreds in counts:
+            if npreds in reached:
                 continue
-            newx = np.bitwise_and(x, ds.evi[pred])
-            count_pred_sets(npreds, ncols, newx)
-
-    count_pred_sets(frozenset(), frozenset(), np.full((ds.eviSize // 8,), 255, dtype=np.uint8))
+            newx = intersect(x, ds.evi[pred])
+            count_pred_sets(npreds, ncols, newx, level)
 
     y1_function = y1()
     y2_function = y2()
 
-    visited = set()
+    visited = {}
+    accepted = set()
     DCResults = []
 
-    def search(preds, cols):
-        if preds in visited:
+    def search(preds, cols, level):
+        if preds in visited or (budget is not None and budget.exceeded()):
             return
-        visited.add(preds)
-        if len(preds) >= depth:
+        visited[preds] = None
+        if len(preds) >= level:
             return
         for pred in ds.sortedPreds:
+            if budget is not None and budget.exceeded():
+                break
             ncol = ds.predCols[pred]
             if ncol in cols:
                 continue
             npreds = preds | {pred}
             ncols = cols | {ncol}
-            a1 = int(counts[npreds])
-            b1 = int(counts[preds]) - a1
+            if accepted and contains_accepted(npreds, accepted):
+                continue
+            a1 = counts[npreds]
+            b1 = counts[preds] - a1
+            add(stats, "significance_tests")
             valid = True
             for subPreds in powerset(preds):
                 subPreds = frozenset(subPreds)
                 npreds2 = subPreds | {pred}
-                a2 = int(counts[npreds2])
-                b2 = int(counts[subPreds]) - a2
+                a2 = counts[npreds2]
+                b2 = counts[subPreds] - a2
                 u = y1_function(a1 + 1) - y1_function(b1 + 1) - y1_function(a2 + 1) + y1_function(b2 + 1)
                 s = np.sqrt(y2_function(a1 + 1) + y2_function(b1 + 1) + y2_function(a2 + 1) + y2_function(b2 + 1))
                 if u + 2 * s > 0:
                     valid = False
                     break
             if valid:
-                if a1 == 0:
-                    DCResults.append((preds, pred))
+                if meets_tolerance(a1, b1, epsilon):
+                    DCResults.append((preds, pred, a1))
+                    accepted.add(npreds)
                 else:
-                    search(npreds, ncols)
+                    search(npreds, ncols, level)
 
-    search(frozenset(), frozenset())
+    # Each level searches from the sets visited at the depth of the previous one, in visiting order (see
+    # significance_search)
+    roots = None
+    for level in ([depth] if budget is None else range(1, depth + 1)):
+        known = len(counts)
+        reached.clear()
+        with phase(stats, "counting"):
+            count_pred_sets(frozenset(), frozenset(), ds.fullBits(), level)
+        add(stats, "lattice_nodes", len(counts) - known)
+        if budget is not None and budget.exceeded():
+            break
+        visited.clear()
+        with phase(stats, "significance"):
+            for preds in [frozenset()] if roots is None else roots:
+                search(preds, frozenset(ds.predCols[pred] for pred in preds), level)
+        add(stats, "significance_nodes", len(visited) - (0 if roots is None else len(roots)))
+        roots = [preds for preds in visited if len(preds) == level]
 
     def getPred(i, ds):
         return ds.preds[i]
 
     dcs = set()
-    dcs_out = []
+    dcs_out = {}
 
-    for dc in [DenialConstraint([getPred(p, ds) for p in preds] + [getPred(pred, ds)]) for preds, pred in DCResults]:
+    for preds, pred, a1 in DCResults:
+        dc = DenialConstraint([getPred(p, ds) for p in preds] + [getPred(pred, ds)])
         if all(pred.op.__repr__() == "==" for pred in dc.preds):
             s = frozenset(dc.preds)
             if s not in dcs:
                 dcs.add(s)
-                dcs_out.append(dc.__repr__())
+                dcs_out[dc.__repr__()] = a1 / ds.eviSize
+    add(stats, "dcs_found", len(DCResults))
+    add(stats, "dcs_distinct", len(dcs_out))
 
-    return dcs_out
+    return dcs_out if ratios else list(dcs_out)
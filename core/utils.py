@@ -1,6 +1,8 @@
 # utils.py
 
 import itertools
+from collections import OrderedDict
+
 import numpy as np
 
 def powerset(iterable):
@@ -8,21 +10,104 @@ def powerset(iterable):
     s = list(iterable)
     return itertools.chain.from_iterable(itertools.combinations(s, r) for r in range(len(s)))
 
+# Digamma and trigamma of the counts. Arguments up to GAMMA_TABLE are read from tables built with the recurrences
+# digamma(n + 1) = digamma(n) + 1/n and trigamma(n + 1) = trigamma(n) - 1/n^2; larger ones (and non-integers, like the
+# reweighted counts of sampled pairs) use the asymptotic series, accurate to double precision there. So memory does not
+# grow with the number of tuple pairs.
+GAMMA_TABLE = 1 << 16
+_steps = np.arange(1, GAMMA_TABLE)
+Y1_TABLE = np.cumsum(np.concatenate(([-0.5772156649], 1 / _steps)))  # digamma(n) == Y1_TABLE[n - 1]
+Y2_TABLE = np.cumsum(np.concatenate(([np.pi**2 / 6], -1 / _steps**2)))  # trigamma(n) == Y2_TABLE[n - 1]
+# The digamma table starts from a rounded Euler constant, and the series is shifted the same way
+GAMMA_OFFSET = 0.5772156649015329 - 0.5772156649
+
+
+def digamma_series(x):
+    x = np.array(x, dtype=float)
+    acc = np.zeros_like(x)
+    small = x < 10
+    while small.any():
+        acc[small] -= 1 / x[small]
+        x[small] += 1
+        small = x < 10
+    inv2 = 1 / (x * x)
+    series = inv2 * (1 / 12 - inv2 * (1 / 120 - inv2 * (1 / 252 - inv2 * (1 / 240 - inv2 / 132))))
+    return acc + np.log(x) - 0.5 / x - series + GAMMA_OFFSET
+
+
+def trigamma_series(x):
+    x = np.array(x, dtype=float)
+    acc = np.zeros_like(x)
+    small = x < 10
+    while small.any():
+        acc[small] += 1 / x[small] ** 2
+        x[small] += 1
+        small = x < 10
+    inv2 = 1 / (x * x)
+    series = inv2 * (1 / 6 - inv2 * (1 / 30 - inv2 * (1 / 42 - inv2 * (1 / 30 - inv2 * 5 / 66))))
+    return acc + 1 / x + inv2 / 2 + series / x
+
+
+def _lookup(table, series, x):
+    x = np.asarray(x)
+    if x.dtype.kind in "iu":
+        inTable = x <= GAMMA_TABLE
+        if inTable.all():
+            return table[x - 1]
+    else:
+        inTable = (x >= 1) & (x <= GAMMA_TABLE) & (x == np.floor(x))
+    out = table[np.where(inTable, x, 1).astype(np.int64) - 1]
+    if not inTable.all():
+        out[~inTable] = series(x[~inTable])
+    return out
+
+
+def digamma(x):
+    """Digamma of an array of values (see GAMMA_TABLE)."""
+    return _lookup(Y1_TABLE, digamma_series, x)
+
+
+def trigamma(x):
+    """Trigamma of an array of values (see GAMMA_TABLE)."""
+    return _lookup(Y2_TABLE, trigamma_series, x)
+
+
 def y1():
-    """Memoization for the digamma function."""
-    mem = [-0.5772156649]
+    """Digamma function of a single value."""
     def f(n):
-        while len(mem) < n:
-            mem.append(mem[-1] + 1 / len(mem))
-        return mem[n-1]
+        if 1 <= n <= GAMMA_TABLE and n == int(n):
+            return Y1_TABLE[int(n) - 1]
+        return float(digamma_series(n))
     return f
 
 def y2():
-    """Memoization for the trigamma function."""
-    mem = [np.pi**2 / 6]
+    """Trigamma function of a single value."""
     def f(n):
-        while len(mem) < n:
-            mem.append(mem[-1] - 1 / len(mem)**2)
-        return mem[n-1]
+        if 1 <= n <= GAMMA_TABLE and n == int(n):
+            return Y2_TABLE[int(n) - 1]
+        return float(trigamma_series(n))
     return f
 
+
+class LRUCache(OrderedDict):
+    """Dictionary that keeps at most maxsize entries, evicting the least recently used one."""
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
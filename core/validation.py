@@ -0,0 +1,225 @@
+# validation.py
+
+import re
+
+import numpy as np
+
+from core.dataset import Dataset
+from core.denialconstraints import DenialConstraint, DenialConstraintSet
+from core.evidence import BLOCK_PAIRS, compare
+from core.operator_predicate import Predicate
+from core.stats import add, phase
+
+# Predicates as printed by DenialConstraint, like DenialConstraintSet parses them
+PRED_PATTERN = r't0\.([^=><]*) (==|<>|>=|<=|>|<) t1\.([^=><]*)'
+
+
+def parse_dc(line, opmap):
+    """Predicates of a DC printed as ¬(t0.A op t1.B ^ ...) (or !(...))."""
+    preds = []
+    for pred in line.strip()[2:-1].split('^'):
+        match = re.match(PRED_PATTERN, pred.strip())
+        if match is None:
+            raise ValueError(f"Unsupported predicate: {pred.strip()}")
+        l, op, r = match.groups()
+        preds.append(Predicate(l, opmap[op], r))
+    return preds
+
+
+def dc_predicates(dcs, opmap):
+    """Predicates of every DC, given as printed strings, DenialConstraints or a DenialConstraintSet."""
+    if isinstance(dcs, DenialConstraintSet):
+        return [[dcs.dss.preds[p] for p in dc] for dc in dcs.DCs]
+    return [dc.preds if isinstance(dc, DenialConstraint) else parse_dc(dc, opmap) for dc in dcs]
+
+
+def check_columns(ds, preds):
+    for pred in preds:
+        if pred.l not in ds.codes or pred.r not in ds.codes:
+            raise ValueError(f"Unknown column in predicate: {pred}")
+
+
+def load_rows(dataset_path, loader="pandas", row_count=None, stats=None):
+    # All the rows of a file (or the first row_count), dictionary-encoded
+    with phase(stats, "load"):
+        ds = Dataset(dataset_path, loader=loader, nrows=row_count, encoding='unicode_escape')
+    with phase(stats, "buildPLIs"):
+        ds.buildPLIs()
+        ds.compact()
+    add(stats, "rows", len(ds))
+    return ds
+
+
+def partition(lkeys, rkeys):
+    """Group of every row as a left (t0) and as a right (t1) tuple, such that t0.A == t1.B for all the equality
+    predicates exactly when both rows are in the same group. -1 for rows with a null key. The codes of each predicate
+    are joint codes of its two columns, so a single predicate needs no grouping."""
+    if not lkeys:
+        return None, None
+    gl, gr = lkeys[0].astype(np.int64), rkeys[0].astype(np.int64)
+    for lcodes, rcodes in zip(lkeys[1:], rkeys[1:]):
+        m = int(max(lcodes.max(initial=0), rcodes.max(initial=0))) + 1
+        if (int(max(gl.max(initial=0), gr.max(initial=0))) + 1) * m >= 1 << 62:
+            # Renumber the groups densely before they overflow
+            _, groups = np.unique(np.concatenate([gl, gr]), return_inverse=True)
+            groups = np.where(np.concatenate([gl, gr]) < 0, -1, groups)
+            gl, gr = groups[:len(gl)], groups[len(gl):]
+        nulls_l, nulls_r = (gl < 0) | (lcodes < 0), (gr < 0) | (rcodes < 0)
+        gl, gr = gl * m + lcodes, gr * m + rcodes
+        gl[nulls_l], gr[nulls_r] = -1, -1
+    return gl, gr
+
+
+def sweep(n, gl, gr, lcodes=None, rcodes=None, op=None):
+    """Right rows sorted by (group, code of t1.B), and for every left row the range [lo, hi) of them in its group that
+    satisfy t0.A op t1.B (all of them without op). Nulls satisfy no order operator."""
+    gl = np.zeros(n, dtype=np.int64) if gl is None else gl
+    gr = np.zeros(n, dtype=np.int64) if gr is None else gr
+    if op is None:
+        lcodes, rcodes = np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    m = int(max(lcodes.max(initial=0), rcodes.max(initial=0))) + 1
+
+    right = np.flatnonzero((gr >= 0) & (rcodes >= 0))
+    rkey = gr[right].astype(np.int64) * m + rcodes[right]
+    order = np.argsort(rkey, kind='stable')
+    right, rkey = right[order], rkey[order]
+
+    # Left rows are sorted the same way, as searching sorted keys is much faster
+    left = np.flatnonzero((gl >= 0) & (lcodes >= 0))
+    key = gl[left].astype(np.int64) * m + lcodes[left]
+    order = np.argsort(key, kind='stable')
+    left, key = left[order], key[order]
+    base = key - lcodes[left]
+    start, end = np.searchsorted(rkey, base, 'left'), np.searchsorted(rkey, base + m, 'left')
+    if op == "<":
+        lo, hi = np.searchsorted(rkey, key, 'right'), end
+    elif op == "<=":
+        lo, hi = np.searchsorted(rkey, key, 'left'), end
+    elif op == ">":
+        lo, hi = start, np.searchsorted(rkey, key, 'left')
+    elif op == ">=":
+        lo, hi = start, np.searchsorted(rkey, key, 'right')
+    else:
+        lo, hi = start, end
+    return left, right, lo, hi
+
+
+def pred_ranges(n, gl, gr, lcodes, rcodes, op):
+    """Ranges (see sweep) of the pairs satisfying t0.A op t1.B for an order operator or <>. For <>, nulls get codes
+    distinct from any other value (nulls satisfy <>), and the pairs are the ones with t0.A < t1.B or t0.A > t1.B."""
+    if op != "<>":
+        return [sweep(n, gl, gr, lcodes, rcodes, op)]
+    m = int(max(lcodes.max(initial=0), rcodes.max(initial=0))) + 1
+    rows = np.arange(n)
+    lcodes = np.where(lcodes < 0, m + rows, lcodes)
+    rcodes = np.where(rcodes < 0, m + n + rows, rcodes)
+    return [sweep(n, gl, gr, lcodes, rcodes, "<"), sweep(n, gl, gr, lcodes, rcodes, ">")]
+
+
+def pairs_in(ranges):
+    return sum(int((hi - lo).sum()) for _, _, lo, hi in ranges)
+
+
+def expand(left, right, lo, hi, block_pairs=BLOCK_PAIRS):
+    """(t0, t1) row pairs of the ranges, in blocks of about block_pairs pairs."""
+    sizes = hi - lo
+    keep = sizes > 0
+    left, lo, sizes = left[keep], lo[keep], sizes[keep]
+    ends = np.cumsum(sizes)
+    start = 0
+    while start < len(left):
+        done = ends[start - 1] if start else 0
+        stop = max(start + 1, int(np.searchsorted(ends, done + block_pairs, 'right')))
+        s = sizes[start:stop]
+        offsets = np.arange(s.sum()) - np.repeat(np.cumsum(s) - s, s) + np.repeat(lo[start:stop], s)
+        yield np.repeat(left[start:stop], s), right[offsets]
+        start = stop
+
+
+class DCValidator:
+    """Violations of a DC ¬(p1 ^ ... ^ pm) over the rows of a Dataset: the tuple pairs (t0, t1), t0 != t1, satisfying
+    all of its predicates, found without materializing all the n*(n-1) pairs. Rows are hash-partitioned on the
+    equality predicates, and within each partition the pairs satisfying one order predicate are ranges of the rows
+    sorted on its right column (sort/sweep). Only the pairs in those ranges are checked against the other predicates."""
+
+    def __init__(self, ds, preds):
+        check_columns(ds, preds)
+        self.n = len(ds)
+        codes = [ds.pairCodes(pred.l, pred.r) for pred in preds]
+        ops = [repr(pred.op) for pred in preds]
+        self.preds = list(zip(preds, codes))
+        eqs = [k for k, op in enumerate(ops) if op == "=="]
+        gl, gr = partition([codes[k][0] for k in eqs], [codes[k][1] for k in eqs])
+
+        # Sweep on the order (or <>) predicate leaving the fewest pairs to check
+        best = None
+        for k, op in enumerate(ops):
+            if op != "==":
+                ranges = pred_ranges(self.n, gl, gr, codes[k][0], codes[k][1], op)
+                if best is None or pairs_in(ranges) < pairs_in(best[1]):
+                    best = (k, ranges)
+        if best is None:
+            best = (None, [sweep(self.n, gl, gr)])
+        self.ranges = best[1]
+        self.residual = [(pred, lc, rc) for k, (pred, (lc, rc)) in enumerate(self.preds)
+                         if k != best[0] and k not in eqs]
+
+    def selfPairs(self):
+        # Rows whose pair with themselves satisfies every predicate, which the ranges may include
+        rows = np.ones(self.n, dtype=bool)
+        for pred, (lc, rc) in self.preds:
+            rows &= compare(pred.op, lc, rc, True)
+        return int(rows.sum())
+
+    def violations(self, block_pairs=BLOCK_PAIRS):
+        """Violating (t0, t1) row pairs, in blocks of arrays."""
+        for t0, t1 in (block for ranges in self.ranges for block in expand(*ranges, block_pairs=block_pairs)):
+            keep = t0 != t1
+            for pred, lc, rc in self.residual:
+                keep &= compare(pred.op, lc[t0], rc[t1], True)
+            if keep.any():
+                yield t0[keep], t1[keep]
+
+    def count(self):
+        if not self.residual:
+            return pairs_in(self.ranges) - self.selfPairs()
+        return sum(len(t0) for t0, _ in self.violations())
+
+
+def validate_dcs(dataset_path, dcs, limit=0, loader="pandas"):
+    """Number of violations of every DC over all the rows of a file, and its first limit violating pairs (None for all).
+    DCs are printed strings (as returned by discover_dcs), DenialConstraints or a DenialConstraintSet."""
+    ds = load_rows(dataset_path, loader)
+    results = []
+    for preds in dc_predicates(dcs, ds.opmap):
+        validator = DCValidator(ds, preds)
+        pairs = []
+        if limit == 0:
+            count = validator.count()
+        else:
+            count = 0
+            for t0, t1 in validator.violations():
+                count += len(t0)
+                if limit is None or len(pairs) < limit:
+                    pairs.extend(zip(t0.tolist(), t1.tolist()))
+            pairs = pairs if limit is None else pairs[:limit]
+        results.append({"dc": repr(DenialConstraint(preds)), "violations": count, "pairs": pairs})
+    return results
+
+
+def stream_violations(ds, dcs, limit=None):
+    """Violations as records: {"dc", "t0", "t1"} for the violating row pairs of every DC (at most limit of them), then
+    {"dc", "violations"} with its number of violations."""
+    for preds in dc_predicates(dcs, ds.opmap):
+        dc = repr(DenialConstraint(preds))
+        validator = DCValidator(ds, preds)
+        if limit == 0:
+            yield {"dc": dc, "violations": validator.count()}
+            continue
+        count = 0
+        for t0, t1 in validator.violations():
+            for i, j in zip(t0.tolist(), t1.tolist()):
+                if limit is None or count < limit:
+                    yield {"dc": dc, "t0": i, "t1": j}
+                count += 1
+        yield {"dc": dc, "violations": count}
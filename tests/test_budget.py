@@ -0,0 +1,52 @@
+# test_budget.py
+import numpy as np
+import pytest
+
+from core.budget import Budget, MemoryBudgetExceeded
+from core.dc_discovery import discover_dcs
+from core.stats import Stats
+from core.unique_dc_discovery import discover_unique_constraints
+from tests.test_incremental import make_table
+
+
+def test_memory_already_held_is_not_charged():
+    held = np.ones(64 << 17)  # 64 MB allocated before the run
+    budget = Budget(memory=16 << 20)
+    assert not any(budget.exceeded() for _ in range(2))
+    budget.reserve(8 << 20, "Evidence")
+    assert not budget.exhausted
+    del held
+
+
+def test_reserve_refuses_growth_above_the_limit():
+    budget = Budget(memory=16 << 20)
+    with pytest.raises(MemoryBudgetExceeded, match="Evidence"):
+        budget.reserve(32 << 20, "Evidence")
+    assert budget.exhausted and budget.reason == "memory"
+    grown = np.ones(32 << 17)  # 32 MB more once the run started
+    assert Budget(memory=16 << 20).used() == 0
+    assert budget.used() >= 16 << 20
+    del grown
+
+
+
+@pytest.mark.parametrize("kind", ["all", "unique"])
+@pytest.mark.parametrize("options", [{}, {"counting": "lazy"}, {"epsilon": 0.01, "batched": False}, {"workers": 2}])
+def test_anytime_levels_are_searched_once(tmp_path, kind, options):
+    # Levels searched one at a time find the DCs of a single search, without counting or visiting a set twice
+    if kind == "unique" and set(options) - {"epsilon", "batched"}:
+        pytest.skip("option of discover_dcs only")
+    df = make_table(120)
+    df.insert(0, "Id", range(len(df)))
+    df.to_csv(tmp_path / "t.csv", index=False)
+    if kind == "unique":
+        run = lambda **kw: discover_unique_constraints(tmp_path / "t.csv", depth=3, epsilon=options.get("epsilon", 0.0),
+                                                       **kw)
+    else:
+        run = lambda **kw: discover_dcs(tmp_path / "t.csv", depth=3, **options, **kw)
+    single, anytime = Stats(), Stats()
+    expected = run(stats=single)
+    assert expected
+    assert set(run(budget=Budget(seconds=1000), stats=anytime)) == set(expected)
+    for counter in ("lattice_nodes", "significance_nodes"):
+        assert anytime.counters[counter] <= single.counters[counter]
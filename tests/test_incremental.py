@@ -0,0 +1,63 @@
+# test_incremental.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.dc_discovery import discover_dcs
+from core.incremental import IncrementalDiscovery
+
+
+def make_table(n, seed=0):
+    # Columns with an FD (Zip -> City), an order dependency (Tax = 2 * Price) and type-compatible pairs of columns for
+    # the cross-column predicates (Price and Cost, City and Origin)
+    rng = np.random.default_rng(seed)
+    zips = rng.integers(0, 8, n)
+    price = rng.integers(0, 40, n)
+    return pd.DataFrame({
+        "Zip": zips,
+        "City": [f"c{z % 5}" for z in zips],
+        "Origin": [f"c{v}" for v in rng.integers(0, 5, n)],
+        "Price": price,
+        "Tax": price * 2,
+        "Cost": rng.integers(10, 50, n),
+    })
+
+
+@pytest.mark.parametrize("mode", ["vectorized", "derived"])
+@pytest.mark.parametrize("cross", [False, True])
+def test_append_matches_discovery_on_concatenated_file(tmp_path, mode, cross):
+    df = make_table(140)
+    parts = [df.iloc[:80], df.iloc[80:120], df.iloc[120:]]
+    for i, part in enumerate(parts):
+        part.to_csv(tmp_path / f"batch{i}.csv", index=False)
+
+    inc = IncrementalDiscovery(tmp_path / "batch0.csv", depth=3, evidence_mode=mode, cross_columns=cross)
+    for i in range(1, len(parts)):
+        result = inc.append(tmp_path / f"batch{i}.csv")
+        df.iloc[:sum(len(p) for p in parts[:i + 1])].to_csv(tmp_path / "full.csv", index=False)
+        expected = discover_dcs(tmp_path / "full.csv", depth=3, evidence_mode=mode, cross_columns=cross)
+        assert result["denial_constraints"] == expected
+        assert result["denial_constraints"]
+
+
+def test_append_casts_batch_to_first_types(tmp_path):
+    (tmp_path / "first.csv").write_text("A,B\n1,a\n2,b\n3,c\n")
+    (tmp_path / "batch.csv").write_text("A,B\n4,1\n5,2\n")
+    (tmp_path / "full.csv").write_text("A,B\n1,a\n2,b\n3,c\n4,1\n5,2\n")
+
+    inc = IncrementalDiscovery(tmp_path / "first.csv", depth=2)
+    result = inc.append(tmp_path / "batch.csv")
+    assert result["denial_constraints"] == discover_dcs(tmp_path / "full.csv", depth=2)
+    assert list(inc.ds.vals["B"]) == ["1", "2", "a", "b", "c"]
+
+
+def test_append_rejects_batch_that_cannot_be_cast(tmp_path):
+    (tmp_path / "first.csv").write_text("A,B\n1,a\n2,b\n3,c\n")
+    (tmp_path / "batch.csv").write_text("A,B\n4,d\nx,e\n")
+
+    inc = IncrementalDiscovery(tmp_path / "first.csv", depth=2)
+    dcs, codes = inc.dcs, {col: inc.ds.codes[col].copy() for col in inc.ds.columns}
+    with pytest.raises(ValueError, match="Column A"):
+        inc.append(tmp_path / "batch.csv")
+    assert len(inc.ds) == 3 and inc.dcs == dcs
+    assert all(np.array_equal(inc.ds.codes[col], codes[col]) for col in inc.ds.columns)
@@ -0,0 +1,43 @@
+# test_jobs.py
+import os
+import signal
+import time
+
+from app.jobs import JobQueue
+
+
+def killed():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def wait(predicate, timeout=30):
+    end = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < end:
+        time.sleep(0.05)
+    return predicate()
+
+
+def test_cancel_terminates_running_job_and_frees_its_slot():
+    jobs = JobQueue(1, 4)
+    running = jobs.submit(time.sleep, 60)
+    queued = jobs.submit(sum, [1, 2])
+    assert running.status == "running" and queued.status == "queued"
+    jobs.cancel(running.id)
+    assert wait(lambda: queued.status == "done")
+    assert queued.result == 3
+    assert running.status == "cancelled" and running.process.exitcode is not None
+    assert jobs.stats()["running"] == 0
+
+
+def test_job_process_killed_is_failed_with_its_exit_code():
+    jobs = JobQueue(1, 4)
+    job = jobs.submit(killed)
+    assert wait(lambda: job.status == "failed")
+    assert job.error == f"Job process exited with code {-signal.SIGKILL}"
+
+
+def test_job_error_is_reported():
+    jobs = JobQueue(1, 4)
+    job = jobs.submit(int, "x")
+    assert wait(lambda: job.status == "failed")
+    assert job.error.startswith("ValueError")
@@ -0,0 +1,56 @@
+# test_key_discovery.py
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.dc_discovery import meets_tolerance
+from core.key_discovery import discover_keys, minimal_keys
+from core.validation import load_rows
+
+
+def make_table(n, seed=0):
+    # Low-cardinality columns, so that keys need several of them, with nulls in some
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "A": rng.integers(0, 6, n),
+        "B": rng.integers(0, 5, n),
+        "C": [f"c{v}" for v in rng.integers(0, 4, n)],
+        "D": rng.integers(0, 3, n).astype(float),
+        "E": rng.integers(0, 40, n),
+    })
+    df.loc[rng.random(n) < 0.1, "C"] = None
+    df.loc[rng.random(n) < 0.1, "D"] = None
+    return df
+
+
+def brute_force_keys(df, depth, epsilon):
+    # Minimal keys from the ordered pairs of rows agreeing on every column of each combination, nulls agreeing with
+    # nothing
+    n = len(df)
+    pairs = n * (n - 1)
+    keys = {}
+    for size in range(1, (depth or len(df.columns)) + 1):
+        for cols in combinations(df.columns, size):
+            if any(set(key) < set(cols) for key in keys):
+                continue
+            sizes = df[list(cols)].dropna().groupby(list(cols)).size().to_numpy()
+            violations = int((sizes * (sizes - 1)).sum())
+            if meets_tolerance(violations, pairs - violations, epsilon):
+                keys[cols] = violations
+    return keys
+
+
+@pytest.mark.parametrize("rows", [30, 150])
+@pytest.mark.parametrize("depth", [1, 2, 3, None])
+@pytest.mark.parametrize("epsilon", [0.0, 0.01, 0.05])
+def test_minimal_keys_match_brute_force(tmp_path, rows, depth, epsilon):
+    df = make_table(rows)
+    df.to_csv(tmp_path / "t.csv", index=False)
+    ds = load_rows(tmp_path / "t.csv")
+    expected = brute_force_keys(df, depth, epsilon)
+    assert dict(minimal_keys(ds, depth, epsilon)) == expected
+
+    ratios = discover_keys(tmp_path / "t.csv", depth=depth, epsilon=epsilon, ratios=True)
+    assert sorted(ratios.values()) == sorted(v / (len(df) * (len(df) - 1)) for v in expected.values())
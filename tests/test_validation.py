@@ -0,0 +1,82 @@
+# test_validation.py
+import operator
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.validation import load_rows, stream_violations, validate_dcs
+
+OPS = {"==": operator.eq, "<>": operator.ne, "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+DCS = [
+    "¬(t0.A == t1.A)",
+    "¬(t0.P >= t1.P)",
+    "¬(t0.A == t1.A ^ t0.S <> t1.S)",
+    "¬(t0.P < t1.P ^ t0.Q > t1.Q)",
+    "¬(t0.P == t1.Q ^ t0.S == t1.S)",
+    "¬(t0.P <= t1.Q ^ t0.A <> t1.A)",
+    "¬(t0.S <> t1.T)",
+    "¬(t0.A == t1.A ^ t0.S == t1.T ^ t0.P > t1.Q)",
+]
+
+
+def make_table(n, seed=0):
+    # Low-cardinality columns with nulls, and type-compatible pairs of columns (P and Q, S and T) for the cross-column
+    # predicates
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "A": rng.integers(0, 4, n),
+        "P": rng.integers(0, 8, n).astype(float),
+        "Q": rng.integers(0, 8, n).astype(float),
+        "S": [f"s{v}" for v in rng.integers(0, 3, n)],
+        "T": [f"s{v}" for v in rng.integers(0, 3, n)],
+    })
+    for col in ["P", "Q", "S", "T"]:
+        df.loc[rng.random(n) < 0.15, col] = None
+    return df
+
+
+def brute_force_violations(df, dc):
+    # Row pairs (t0, t1), t0 != t1, satisfying every predicate of the DC. Nulls satisfy <> only.
+    preds = [pred.strip().split(" ") for pred in dc[2:-1].split("^")]
+    rows = df.to_dict("records")
+    pairs = []
+    for i, t0 in enumerate(rows):
+        for j, t1 in enumerate(rows):
+            if i != j and all(holds(op, t0[l[3:]], t1[r[3:]]) for l, op, r in preds):
+                pairs.append((i, j))
+    return pairs
+
+
+def holds(op, a, b):
+    if pd.isna(a) or pd.isna(b):
+        return op == "<>"
+    return OPS[op](a, b)
+
+
+@pytest.mark.parametrize("limit", [0, None, 3])
+def test_validate_dcs_matches_brute_force(tmp_path, limit):
+    df = make_table(60)
+    df.to_csv(tmp_path / "t.csv", index=False)
+    results = validate_dcs(tmp_path / "t.csv", DCS, limit=limit)
+    assert [r["dc"] for r in results] == DCS
+    for dc, result in zip(DCS, results):
+        expected = brute_force_violations(df, dc)
+        assert expected, dc
+        assert result["violations"] == len(expected), dc
+        if limit is None:
+            assert sorted(result["pairs"]) == expected, dc
+        else:
+            assert len(result["pairs"]) == min(limit, len(expected))
+            assert set(result["pairs"]) <= set(expected), dc
+
+
+def test_stream_violations_matches_brute_force(tmp_path):
+    df = make_table(40, seed=1)
+    df.to_csv(tmp_path / "t.csv", index=False)
+    records = list(stream_violations(load_rows(tmp_path / "t.csv"), DCS))
+    for dc in DCS:
+        expected = brute_force_violations(df, dc)
+        assert sorted((r["t0"], r["t1"]) for r in records if r["dc"] == dc and "t0" in r) == expected
+        assert {"dc": dc, "violations": len(expected)} in records